@@ -1,6 +1,12 @@
+import heapq
 from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Literal, TextIO
 
-from aoc_helpers import get_input_path, split_list
+import numpy as np
+
+from aoc_helpers import get_input_path
+
+Engine = Literal["stream", "numpy"]
 
 
 @dataclass
@@ -24,21 +30,111 @@ class Elf:
         self.food_item_calories.append(item)
 
 
-if __name__ == "__main__":
-    # Read the input file.
-    with open(get_input_path()) as f:
-        inventories = [line.strip() for line in f]
+def read_lines(f: TextIO, chunk_size: int = 1 << 20) -> Iterator[str]:
+    """Yield stripped lines from a file object, reading it in fixed-size chunks.
+
+    Only the current chunk and any partial line carried over from the
+    previous chunk are held in memory.
+    """
+    remainder = ""
+    while chunk := f.read(chunk_size):
+        lines = (remainder + chunk).split("\n")
+        # The last line may continue into the next chunk.
+        remainder = lines.pop()
+        for line in lines:
+            yield line.strip()
+
+    if remainder:
+        yield remainder.strip()
+
+
+def iter_total_calories(lines: Iterable[str]) -> Iterator[int]:
+    """Yield the total calories for each elf, keeping only a running sum."""
+    total, in_group = 0, False
+    for line in lines:
+        if line:
+            total += int(line)
+            in_group = True
+        elif in_group:
+            yield total
+            total, in_group = 0, False
+
+    if in_group:
+        yield total
+
+
+def iter_elves(lines: Iterable[str]) -> Iterator[Elf]:
+    """Yield an Elf for each inventory, materialising one elf at a time."""
+    elf = Elf()
+    for line in lines:
+        if line:
+            elf.add_food_item_calories(int(line))
+        elif elf.food_item_calories:
+            yield elf
+            elf = Elf()
+
+    if elf.food_item_calories:
+        yield elf
+
+
+def top_k_total_calories(totals: Iterable[int], k: int = 3) -> list[int]:
+    """Return the k largest totals in descending order using a bounded heap."""
+    return heapq.nlargest(k, totals)
 
-    elves = [
-        Elf([int(cals) for cals in item_calories])
-        for item_calories in split_list(inventories, "")
-    ]
+
+def total_calories_np(text: str) -> np.ndarray:
+    """Return the total calories for each elf as an array using NumPy.
+
+    All calorie values are converted to ints in one go, then the group
+    totals are summed with np.add.reduceat at the blank line boundaries.
+    """
+    lines = np.array(text.split("\n"))
+    blank = np.char.str_len(np.char.strip(lines)) == 0
+    item_calories = lines[~blank].astype(np.int64)
+
+    # Each blank line marks the start of a new group at the index of the
+    # next item, which is the number of items seen so far.
+    blank_idx = np.flatnonzero(blank)
+    group_starts = np.unique(
+        np.concatenate(([0], blank_idx - np.arange(len(blank_idx))))
+    )
+    # Drop boundaries from trailing blank lines, which start empty groups.
+    group_starts = group_starts[group_starts < len(item_calories)]
+
+    return np.add.reduceat(item_calories, group_starts)
+
+
+def top_k_total_calories_np(totals: np.ndarray, k: int = 3) -> np.ndarray:
+    """Return the k largest totals in descending order using np.partition."""
+    k = min(k, len(totals))
+    if k <= 0:
+        return totals[:0]
+    top_k = np.partition(totals, len(totals) - k)[len(totals) - k :]
+    return np.sort(top_k)[::-1]
+
+
+def get_top_k_total_calories(
+    path: str,
+    k: int = 3,
+    engine: Engine = "numpy",
+) -> list[int]:
+    """Return the k largest elf calorie totals from the file at path."""
+    with open(path) as f:
+        if engine == "numpy":
+            return top_k_total_calories_np(total_calories_np(f.read()), k).tolist()
+        elif engine == "stream":
+            return top_k_total_calories(iter_total_calories(read_lines(f)), k)
+
+    raise ValueError("Valid engines are 'stream' and 'numpy'.")
+
+
+if __name__ == "__main__":
+    top3 = get_top_k_total_calories(get_input_path(), k=3, engine="numpy")
 
     # Solution to part 1.
-    total_calories_per_elf = sorted(elf.total_calories for elf in elves)
-    max_total_calories = total_calories_per_elf[-1]
+    max_total_calories = top3[0]
     print(f"The max calories that any elf is carrying is: {max_total_calories}.")
 
     # Solution to part 2.
-    top3_total_calories = sum(total_calories_per_elf[-3:])
+    top3_total_calories = sum(top3)
     print(f"The total calories carried by the top 3 elves is: {top3_total_calories}.")
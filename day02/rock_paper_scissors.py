@@ -1,4 +1,5 @@
 from enum import IntEnum
+from typing import Literal
 
 from aoc_helpers import get_input_path
 
@@ -34,79 +35,95 @@ RPS_MAPPER: dict[str, HandShape] = {
     "Z": HandShape.SCISSORS,
 }
 
+RESULT_MAPPER: dict[str, GameResult] = {
+    "X": GameResult.L,
+    "Y": GameResult.D,
+    "Z": GameResult.W,
+}
 
-if __name__ == "__main__":
-    with open(get_input_path()) as f:
-        games: list[str] = [line.strip() for line in f]
+# Strategy for the second column: either the hand shape to play or the
+# result the game needs to end in.
+Strategy = Literal["shape", "result"]
 
-    ## Challenge: Part 1
-    p1_score, p2_score = 0, 0
-
-    for game in games:
-        p1: HandShape
-        p2: HandShape
-        p1, p2 = map(RPS_MAPPER.get, game.split(" "))
-        if (
-            (p1 == HandShape.ROCK and p2 == HandShape.SCISSORS)
-            or (p1 == HandShape.PAPER and p2 == HandShape.ROCK)
-            or (p1 == HandShape.SCISSORS and p2 == HandShape.PAPER)
-        ):
-            p1_score += GameResult["W"].score + p1.score
-            p2_score += GameResult["L"].score + p2.score
-        elif p1.name == p2.name:
-            p1_score += GameResult["D"].score + p1.score
-            p2_score += GameResult["D"].score + p2.score
-        else:
-            p1_score += GameResult["L"].score + p1.score
-            p2_score += GameResult["W"].score + p2.score
+# The shape that each shape beats.
+BEATS: dict[HandShape, HandShape] = {
+    HandShape.ROCK: HandShape.SCISSORS,
+    HandShape.PAPER: HandShape.ROCK,
+    HandShape.SCISSORS: HandShape.PAPER,
+}
+LOSES_TO: dict[HandShape, HandShape] = {v: k for k, v in BEATS.items()}
+
+
+def play(p1: HandShape, p2: HandShape) -> tuple[GameResult, GameResult]:
+    """Return the game result for each player."""
+    if BEATS[p1] == p2:
+        return GameResult.W, GameResult.L
+    elif p1 == p2:
+        return GameResult.D, GameResult.D
+    else:
+        return GameResult.L, GameResult.W
+
+
+def choose_shape(p1: HandShape, result: GameResult) -> HandShape:
+    """Return the shape the second player needs for the given result."""
+    if result == GameResult.W:
+        return LOSES_TO[p1]
+    elif result == GameResult.D:
+        return p1
+    else:
+        return BEATS[p1]
+
+
+def score_round(p1: HandShape, p2: HandShape) -> tuple[int, int]:
+    """Return the score of a round for each player."""
+    p1_result, p2_result = play(p1, p2)
+    return p1_result.score + p1.score, p2_result.score + p2.score
+
+
+def build_score_table(strategy: Strategy) -> dict[bytes, tuple[int, int]]:
+    """Precompute the score for both players for each of the 9 possible lines."""
+    table = {}
+    for char1, p1 in [(c, RPS_MAPPER[c]) for c in "ABC"]:
+        for char2 in "XYZ":
+            if strategy == "shape":
+                p2 = RPS_MAPPER[char2]
+            else:
+                p2 = choose_shape(p1, RESULT_MAPPER[char2])
+            table[f"{char1} {char2}".encode()] = score_round(p1, p2)
 
-    print(f"Opponent score: {p1_score}")
-    print(f"My score: {p2_score}")
+    return table
 
-    RESULT_MAPPER: dict[str, GameResult] = {
-        "X": GameResult["L"],
-        "Y": GameResult["D"],
-        "Z": GameResult["W"],
-    }
 
-    ## Challenge: Part 2
-    p1_score, p2_score = 0, 0
-
-    def get_winning_play(shape: HandShape):
-        if shape == HandShape.ROCK:
-            return HandShape.PAPER
-
-    for game in games:
-        char1, char2 = game.split(" ")
-        p1: HandShape = RPS_MAPPER.get(char1)
-        result: GameResult = RESULT_MAPPER.get(char2)
-
-        if result == GameResult["W"]:
-            if p1 == HandShape.ROCK:
-                p2 = HandShape.PAPER
-            elif p1 == HandShape.PAPER:
-                p2 = HandShape.SCISSORS
-            else:
-                p2 = HandShape.ROCK
+SCORE_TABLES: dict[Strategy, dict[bytes, tuple[int, int]]] = {
+    "shape": build_score_table("shape"),
+    "result": build_score_table("result"),
+}
 
-            p1_score += GameResult["L"].score + p1.score
-            p2_score += result.score + p2.score
 
-        elif result == GameResult["D"]:
-            p2 = p1
-            p1_score += result.score + p1.score
-            p2_score += result.score + p2.score
+def count_rounds(data: bytes) -> dict[bytes, int]:
+    """Count the occurrences of each of the 9 possible lines in the raw bytes."""
+    # Each kind is a distinct 3-byte token, so matches can't span two lines.
+    return {line: data.count(line) for line in SCORE_TABLES["shape"]}
 
-        else:
-            if p1 == HandShape.ROCK:
-                p2 = HandShape.SCISSORS
-            elif p1 == HandShape.PAPER:
-                p2 = HandShape.ROCK
-            else:
-                p2 = HandShape.PAPER
 
-            p1_score += GameResult["W"].score + p1.score
-            p2_score += GameResult["L"].score + p2.score
+def total_scores(counts: dict[bytes, int], strategy: Strategy) -> tuple[int, int]:
+    """Return the total score for each player as a dot product of counts and scores."""
+    table = SCORE_TABLES[strategy]
+    p1_score = sum(n * table[line][0] for line, n in counts.items())
+    p2_score = sum(n * table[line][1] for line, n in counts.items())
+    return p1_score, p2_score
+
 
+if __name__ == "__main__":
+    with open(get_input_path(), "rb") as f:
+        counts = count_rounds(f.read())
+
+    ## Challenge: Part 1
+    p1_score, p2_score = total_scores(counts, strategy="shape")
+    print(f"Opponent score: {p1_score}")
+    print(f"My score: {p2_score}")
+
+    ## Challenge: Part 2
+    p1_score, p2_score = total_scores(counts, strategy="result")
     print(f"Opponent score: {p1_score}")
     print(f"My score: {p2_score}")
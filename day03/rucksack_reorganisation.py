@@ -1,10 +1,20 @@
 import string
-from functools import reduce
-from itertools import chain, zip_longest
+from itertools import zip_longest
 from typing import Any, Collection, Iterable, List, MutableSet
 
+import numpy as np
+
 from aoc_helpers import get_input_path
 
+# Each item type is a bit in a 52-bit mask, where priority = bit index + 1.
+ITEM_BITS: dict[str, int] = {
+    char: 1 << i
+    for i, char in enumerate(string.ascii_lowercase + string.ascii_uppercase)
+}
+# Lookup table from byte value to item bit, for batches of raw bytes.
+ITEM_BITS_LUT = np.zeros(256, dtype=np.uint64)
+ITEM_BITS_LUT[[ord(char) for char in ITEM_BITS]] = list(ITEM_BITS.values())
+
 
 def get_intersection(x: Collection[Any], y: Collection[Any]) -> MutableSet[Any]:
     """Get the set intersection of two collections."""
@@ -17,38 +27,80 @@ def group_elements(iterable: Iterable, n: int) -> List[List[int]]:
     return list(zip_longest(*[iter(iterable)] * n))
 
 
-if __name__ == "__main__":
-    # View file contents.
-    with open(get_input_path()) as f:
-        rucksacks = [line.strip() for line in f]
+def item_mask(items: str) -> int:
+    """Encode a collection of items as an integer bitmask of item types."""
+    mask = 0
+    for item in items:
+        mask |= ITEM_BITS[item]
+    return mask
+
+
+def mask_priority(mask: int) -> int:
+    """Return the priority of the highest item type in the mask (0 if empty)."""
+    return mask.bit_length()
+
+
+def common_item_priority(rucksack: str) -> int:
+    """Return the priority of the item type in both compartments of a rucksack."""
+    midpoint = len(rucksack) // 2
+    return mask_priority(
+        item_mask(rucksack[:midpoint]) & item_mask(rucksack[midpoint:])
+    )
+
+
+def badge_priority(group: Iterable[str]) -> int:
+    """Return the priority of the item type carried by every elf in the group."""
+    common = -1
+    for rucksack in group:
+        common &= item_mask(rucksack)
+    return mask_priority(common)
 
-    lower_alphabet = list(string.ascii_lowercase)
-    upper_alphabet = list(string.ascii_uppercase)
-    priority_map = dict(zip(lower_alphabet + upper_alphabet, range(1, 53)))
 
-    # Only 1 item should exist in both compartments, so we find it by getting
-    # the intersection of the set.
-    items_in_both_compartments = []
+def rucksack_masks_np(data: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """Encode each line of raw bytes as a pair of uint64 compartment masks."""
+    chars = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(chars == ord("\n"))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(chars)]))
+    # Skip empty lines, such as the one after a trailing newline.
+    non_empty = ends > starts
+    starts, ends = starts[non_empty], ends[non_empty]
+    midpoints = starts + (ends - starts) // 2
 
-    for rucksack in rucksacks:
-        bag_size = len(rucksack)
-        midpoint = int(bag_size / 2)
-        compartments = (rucksack[:midpoint], rucksack[midpoint:])
-        common_items = reduce(get_intersection, compartments)
-        items_in_both_compartments += list(common_items)
+    # Newlines have no item bit, so each reduced segment can safely run on
+    # to the start of the next one.
+    boundaries = np.column_stack((starts, midpoints)).ravel()
+    masks = np.bitwise_or.reduceat(ITEM_BITS_LUT[chars], boundaries)
+    return masks[0::2], masks[1::2]
+
+
+def mask_priorities_np(masks: np.ndarray) -> np.ndarray:
+    """Return the priority of the highest item type in each mask."""
+    # The frexp exponent of a positive integer is its bit length.
+    return np.frexp(masks.astype(np.float64))[1]
+
+
+def sum_priorities_np(data: bytes, group_size: int = 3) -> tuple[int, int]:
+    """Return the common item and badge priority sums for raw rucksack bytes."""
+    left, right = rucksack_masks_np(data)
+    common_items = mask_priorities_np(left & right)
+    badges = mask_priorities_np(
+        np.bitwise_and.reduce((left | right).reshape(-1, group_size), axis=1)
+    )
+    return int(common_items.sum()), int(badges.sum())
+
+
+if __name__ == "__main__":
+    with open(get_input_path()) as f:
+        rucksacks = [line.strip() for line in f]
 
     # Solution: part 1
-    # Now we have the list of items, map across the priority values and get the sum.
-    priorities = map(priority_map.get, items_in_both_compartments)
+    # Only 1 item type should exist in both compartments, so the intersection
+    # of the compartment masks has a single bit set.
+    priorities = map(common_item_priority, rucksacks)
     print(f"Sum of priorities for common items in each compartment: {sum(priorities)}")
 
     # Solution: part 2
-    elf_groups = group_elements(rucksacks, 3)
     # Get the intersection across all 3 elves in each group.
-    badge_items = chain.from_iterable(
-        map(lambda x: reduce(get_intersection, x), elf_groups)
-    )
-
-    # Now we have the list of badge items, map across the priority values and get the sum.
-    priorities = map(priority_map.get, badge_items)
+    priorities = map(badge_priority, group_elements(rucksacks, 3))
     print(f"Sum of priorities for all elf group badges is: {sum(priorities)}")
@@ -1,8 +1,18 @@
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass, field
 from functools import reduce
-from typing import Any, MutableSet
+from itertools import combinations
+from typing import Any, Iterator, MutableSet, Optional
+
+import numpy as np
 
 from aoc_helpers import get_input_path
 
+# Translates the range and pair separators to whitespace for bulk parsing.
+SEPARATORS_TO_SPACE = bytes.maketrans(b"-,", b"  ")
+
 
 def parse_range(rng: str) -> range:
     """Parse an int range in string format "<start>-<end>" to a range object."""
@@ -15,6 +25,158 @@ def union_all(sets: list[MutableSet[Any]]) -> MutableSet[Any]:
     return reduce(lambda x, y: x.union(y), sets)
 
 
+def fully_contains(x: range, y: range) -> bool:
+    """Return True if range x fully contains range y, comparing endpoints only."""
+    return x.start <= y.start and y.stop <= x.stop
+
+
+def overlaps(x: range, y: range) -> bool:
+    """Return True if ranges x and y share at least one section."""
+    return x.start < y.stop and y.start < x.stop
+
+
+def parse_assignments_np(data: bytes) -> tuple[np.ndarray, ...]:
+    """Parse raw assignment bytes into arrays of starts and ends for each elf.
+
+    Returns four int arrays: (start1, end1, start2, end2), with inclusive ends.
+    """
+    numbers = np.array(data.translate(SEPARATORS_TO_SPACE).split()).astype(np.int64)
+    return tuple(numbers.reshape(-1, 4).T)
+
+
+def count_contained_and_overlapping_np(
+    start1: np.ndarray,
+    end1: np.ndarray,
+    start2: np.ndarray,
+    end2: np.ndarray,
+) -> tuple[int, int]:
+    """Count assignment pairs where one fully contains the other, and that overlap."""
+    contained = ((start1 <= start2) & (end2 <= end1)) | (
+        (start2 <= start1) & (end1 <= end2)
+    )
+    overlapping = (start1 <= end2) & (start2 <= end1)
+    return int(contained.sum()), int(overlapping.sum())
+
+
+@dataclass
+class IntervalNode:
+    """A node of a centered interval tree.
+
+    Attributes:
+        center: The section that all intervals at this node contain.
+        by_start: (start, end, id) for intervals at this node, sorted by start.
+        by_end: (start, end, id) for intervals at this node, sorted by end
+            descending.
+        left: Subtree of intervals that end before the center.
+        right: Subtree of intervals that start after the center.
+    """
+
+    center: int
+    by_start: list[tuple[int, int, int]] = field(default_factory=list)
+    by_end: list[tuple[int, int, int]] = field(default_factory=list)
+    left: Optional[IntervalNode] = None
+    right: Optional[IntervalNode] = None
+
+
+class IntervalIndex:
+    """An index of section assignments for overlap queries.
+
+    Assignments are identified by their position in the list of ranges the
+    index is built from. Ends are inclusive, as in the puzzle input.
+    """
+
+    def __init__(self, ranges: list[range]):
+        """Build the interval tree and the sweep-line ordering once."""
+        self.intervals = [(rng.start, rng.stop - 1, i) for i, rng in enumerate(ranges)]
+        self.root = self._build(self.intervals)
+        self._sorted_by_start = sorted(self.intervals)
+
+    def _build(self, intervals: list[tuple[int, int, int]]) -> Optional[IntervalNode]:
+        """Build a balanced tree centered on the median endpoint at each level."""
+        if not intervals:
+            return None
+
+        endpoints = sorted(e for start, end, _ in intervals for e in (start, end))
+        node = IntervalNode(center=endpoints[len(endpoints) // 2])
+
+        left, right = [], []
+        for interval in intervals:
+            start, end, _ = interval
+            if end < node.center:
+                left.append(interval)
+            elif start > node.center:
+                right.append(interval)
+            else:
+                node.by_start.append(interval)
+
+        node.by_start.sort()
+        node.by_end = sorted(node.by_start, key=lambda x: x[1], reverse=True)
+        node.left, node.right = self._build(left), self._build(right)
+        return node
+
+    def stab(self, section: int) -> list[int]:
+        """Return ids of assignments containing the section."""
+        return self.overlapping(range(section, section + 1))
+
+    def overlapping(self, rng: range) -> list[int]:
+        """Return ids of assignments that overlap the range, in O(log n + k)."""
+        lo, hi = rng.start, rng.stop - 1
+        found = []
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if node is None:
+                continue
+
+            if hi < node.center:
+                # Only intervals starting at or before hi can overlap.
+                for start, _, i in node.by_start:
+                    if start > hi:
+                        break
+                    found.append(i)
+                nodes.append(node.left)
+            elif lo > node.center:
+                # Only intervals ending at or after lo can overlap.
+                for _, end, i in node.by_end:
+                    if end < lo:
+                        break
+                    found.append(i)
+                nodes.append(node.right)
+            else:
+                # The range contains the center, so every interval here overlaps.
+                found.extend(i for _, _, i in node.by_start)
+                nodes.extend((node.left, node.right))
+
+        return found
+
+    def overlapping_pairs(self) -> Iterator[tuple[int, int]]:
+        """Yield each pair of overlapping assignment ids with a sweep line.
+
+        Runs in O((n + k) log n) for n assignments and k overlapping pairs.
+        """
+        # Min-heap of (end, id) for assignments the sweep line is still inside.
+        active: list[tuple[int, int]] = []
+        for start, end, i in self._sorted_by_start:
+            while active and active[0][0] < start:
+                heapq.heappop(active)
+            # Every active assignment started earlier and hasn't ended yet.
+            for _, j in active:
+                yield (min(i, j), max(i, j))
+            heapq.heappush(active, (end, i))
+
+
+def brute_force_overlapping(ranges: list[range], rng: range) -> list[int]:
+    """Return ids of assignments that overlap the range by checking each one."""
+    return [i for i, x in enumerate(ranges) if overlaps(x, rng)]
+
+
+def brute_force_overlapping_pairs(ranges: list[range]) -> Iterator[tuple[int, int]]:
+    """Yield each pair of overlapping assignment ids by checking every pair."""
+    for (i, x), (j, y) in combinations(enumerate(ranges), 2):
+        if overlaps(x, y):
+            yield (i, j)
+
+
 if __name__ == "__main__":
     with open(get_input_path()) as f:
         section_assignments = [line.strip() for line in f]
@@ -23,20 +185,13 @@ if __name__ == "__main__":
     sets_overlapping = 0
 
     for assignment in section_assignments:
-        ranges = map(parse_range, assignment.split(","))
-        # Convert to sets of integers so we can use set theory.
-        sets: list = [set(rng) for rng in ranges]
-        largest_set_size = max(len(s) for s in sets)
-
-        combined_set = union_all(sets)
-        # One set is contained within another if the set does not grow when
-        # unioning them.
-        if len(combined_set) == largest_set_size:
+        x, y = map(parse_range, assignment.split(","))
+        # Only the endpoints are compared, so the cost doesn't depend on how
+        # wide the ranges are.
+        if fully_contains(x, y) or fully_contains(y, x):
             sets_fully_containing_the_other += 1
 
-        # If sets overlap, then the length of the combined set should be less
-        # than the sum of the length of both individual sets.
-        if len(combined_set) < sum(len(s) for s in sets):
+        if overlaps(x, y):
             sets_overlapping += 1
 
     # Solution to part 1
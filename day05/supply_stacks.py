@@ -1,12 +1,12 @@
 import re
-from copy import deepcopy
 from pprint import pprint
-from typing import Literal
+from typing import Literal, Optional
 
 from aoc_helpers import get_input_path, split_list
 
 Stacks = dict[int, list[str]]
 CrateMoverVersion = Literal["9000", "9001"]
+MoveInstruction = tuple[int, str, str]
 
 
 def parse_stacks(stacks: list[str]) -> list[list[str]]:
@@ -18,6 +18,16 @@ def parse_stacks(stacks: list[str]) -> list[list[str]]:
     return [list("".join(stack).strip()) for stack in transposed_stacks]
 
 
+def parse_move_instructions(moves: list[str]) -> list[MoveInstruction]:
+    """Parse move lines to (number_to_move, from, to) with the number as an int."""
+    instructions = []
+    for move in moves:
+        number_to_move, from_, to_ = re.findall(r"\d+", move)
+        instructions.append((int(number_to_move), from_, to_))
+
+    return instructions
+
+
 class CrateMover:
     """A class for CrateMover crane."""
 
@@ -39,20 +49,67 @@ class CrateMover:
     def operate(
         self,
         stacks: Stacks,
-        move_instructions: tuple[str, str, str],
+        move_instructions: list[MoveInstruction],
     ) -> Stacks:
         """Operate the CrateMaster on the given stacks using the move instructions."""
-        stacks_ = deepcopy(stacks)
+        # Crates are immutable strings, so copying each stack list once is
+        # enough to leave the given stacks untouched.
+        stacks_ = {stack_id: list(crates) for stack_id, crates in stacks.items()}
+        reverse = self.version == "9000"
 
         for number_to_move, from_, to_ in move_instructions:
-            to_move = stacks_[from_][-int(number_to_move) :]
-            stacks_[from_] = stacks_[from_][: -int(number_to_move)]
+            source = stacks_[from_]
+            split = len(source) - number_to_move
+            to_move = source[split:]
+            del source[split:]
 
             # Reverse the move stack if the version is "9000", not "9001".
-            stacks_[to_] += to_move if self.version == "9001" else to_move[::-1]
+            stacks_[to_].extend(reversed(to_move) if reverse else to_move)
 
         return stacks_
 
+    def top_crates(
+        self,
+        stacks: Stacks,
+        move_instructions: list[MoveInstruction],
+    ) -> dict[str, Optional[str]]:
+        """Get the crate on top of each stack after operating, without moving crates.
+
+        Each final top position is traced backwards through the moves to the
+        position it started in, so the cost is O(stacks x moves) regardless of
+        how many crates each move carries. Empty stacks map to None.
+        """
+        heights = {stack_id: len(crates) for stack_id, crates in stacks.items()}
+        for number_to_move, from_, to_ in move_instructions:
+            heights[from_] -= number_to_move
+            heights[to_] += number_to_move
+
+        reverse = self.version == "9000"
+        tops = {}
+        for stack_id in stacks:
+            if not heights[stack_id]:
+                tops[stack_id] = None
+                continue
+
+            # Track the position as (stack, depth from the top of the stack).
+            current, depth = stack_id, 0
+            for number_to_move, from_, to_ in reversed(move_instructions):
+                if current == to_ and depth < number_to_move:
+                    # The crate was carried by this move.
+                    current = from_
+                    if reverse:
+                        depth = number_to_move - 1 - depth
+                elif from_ == to_:
+                    continue
+                elif current == to_:
+                    depth -= number_to_move
+                elif current == from_:
+                    depth += number_to_move
+
+            tops[stack_id] = stacks[current][-1 - depth]
+
+        return tops
+
 
 if __name__ == "__main__":
     with open(get_input_path()) as f:
@@ -68,16 +125,16 @@ if __name__ == "__main__":
     starting_stacks = dict(zip(stack_ids, stacks))
 
     # Get the numbers from the move instructions (number_to_move, from, to).
-    move_nums = [tuple(re.findall(r"\d{1,2}", move)) for move in moves_data]
+    move_nums = parse_move_instructions(moves_data)
 
     crate_mover = CrateMover(version="9000")
     stacks_result = crate_mover.operate(starting_stacks, move_nums)
     pprint(stacks_result, compact=True)
     # Solution - Part 1
-    pprint("".join([v[-1] for v in stacks_result.values()]))
+    pprint("".join(crate_mover.top_crates(starting_stacks, move_nums).values()))
 
     crate_mover.version = "9001"
     stacks_result = crate_mover.operate(starting_stacks, move_nums)
     pprint(stacks_result, compact=True)
     # Solution - Part 2
-    pprint("".join([v[-1] for v in stacks_result.values()]))
+    pprint("".join(crate_mover.top_crates(starting_stacks, move_nums).values()))
@@ -1,6 +1,7 @@
 import collections
-import re
+import mmap
 from itertools import islice
+from typing import BinaryIO, Hashable, Iterable, Iterator, Optional, Sequence
 
 from aoc_helpers import get_input_path
 
@@ -22,18 +23,87 @@ def get_markers(signal: str, n: int) -> list[str]:
     ]
 
 
+def iter_distinct_run_lengths(signal: Iterable[Hashable]) -> Iterator[int]:
+    """Yield the length of the run of distinct characters ending at each position.
+
+    Single pass that tracks where each character was last seen, so the
+    current run of distinct characters is known without building windows.
+    """
+    last_seen: dict[Hashable, int] = {}
+    run_start = 0
+    for i, char in enumerate(signal):
+        # A repeated character cuts the run back to just after its last position.
+        previous = last_seen.get(char, -1)
+        if previous >= run_start:
+            run_start = previous + 1
+        last_seen[char] = i
+
+        yield i + 1 - run_start
+
+
+def iter_marker_end_positions(signal: Sequence[Hashable], n: int) -> Iterator[int]:
+    """Yield characters processed at each point a marker is detected."""
+    for i, run_length in enumerate(iter_distinct_run_lengths(signal)):
+        if run_length >= n:
+            yield i + 1
+
+
 def get_marker_end_positions(signal: str, n: int) -> list[int]:
     """Return characters processed at each point a marker is detected."""
-    return [re.search(marker, signal).end() for marker in get_markers(signal, n)]
+    return list(iter_marker_end_positions(signal, n))
+
+
+def get_first_marker_end_position(signal: str, n: int) -> Optional[int]:
+    """Return characters processed when the first marker is detected."""
+    return next(iter_marker_end_positions(signal, n), None)
+
+
+def scan_markers(
+    stream: BinaryIO | mmap.mmap,
+    sizes: tuple[int, ...] = (4, 14),
+    chunk_size: int = 1 << 20,
+    first_only: bool = False,
+) -> Iterator[tuple[int, int]]:
+    """Yield (n, bytes processed) for markers of each size in a binary stream.
+
+    The stream is read in fixed-size chunks and the last max(sizes) - 1
+    bytes are carried over, so markers spanning a chunk boundary are found
+    and memory stays flat. All sizes are detected in the same pass. If
+    first_only is True, only the first marker of each size is reported.
+    """
+    carry = b""
+    # Absolute offset of the first byte in the carry.
+    offset = 0
+    keep = max(sizes) - 1
+    remaining = set(sizes)
+
+    while remaining and (chunk := stream.read(chunk_size)):
+        buffer = carry + chunk
+        for i, run_length in enumerate(iter_distinct_run_lengths(buffer)):
+            # Markers ending in the carry were reported with the last chunk.
+            if i < len(carry):
+                continue
+            for n in sizes:
+                if run_length >= n and n in remaining:
+                    yield n, offset + i + 1
+                    if first_only:
+                        remaining.discard(n)
+
+            if not remaining:
+                return
+
+        carry = buffer[-keep:] if keep else b""
+        offset += len(buffer) - len(carry)
 
 
 if __name__ == "__main__":
-    with open(get_input_path()) as f:
-        signal = f.read().rstrip("\n")
+    with open(get_input_path(), "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as signal:
+            first_markers = dict(scan_markers(signal, (4, 14), first_only=True))
 
     # Solution to part 1
     print("The first start-of-packet marker appears after:")
-    print(get_marker_end_positions(signal, n=4)[0])
+    print(first_markers[4])
     # Solution to part 2
     print("The first start-of-message marker appears after:")
-    print(get_marker_end_positions(signal, n=14)[0])
+    print(first_markers[14])
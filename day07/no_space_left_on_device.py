@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right, insort
 from dataclasses import dataclass, field
+from itertools import accumulate
 from pathlib import Path
-from typing import Mapping, Optional
+from typing import Iterator, Mapping, Optional
 
 from aoc_helpers import get_input_path
 
@@ -34,8 +38,11 @@ class File:
 class Dir:
     name: str
     parent: Optional[Dir] = None
-    dirs: Mapping[Path, Dir] = field(default_factory=dict)
-    files: Mapping[Path, File] = field(default_factory=dict)
+    dirs: Mapping[Path | str, Dir] = field(default_factory=dict)
+    files: Mapping[Path | str, File] = field(default_factory=dict)
+    total_size: int = field(default=0, compare=False)
+    size_index: Optional[DirSizeIndex] = field(default=None, repr=False, compare=False)
+    keyed_by_path: bool = field(default=False, repr=False, compare=False)
 
     @property
     def path(self):
@@ -46,25 +53,152 @@ class Dir:
         else:
             return self.parent.path / self.name
 
+    def iter_dirs(self) -> Iterator[Dir]:
+        """Iterate over this directory and all sub-directories, parents first."""
+        stack = [self]
+        while stack:
+            dir_ = stack.pop()
+            yield dir_
+            stack.extend(dir_.dirs.values())
+
+    def aggregate_sizes(self) -> int:
+        """Cache the total size of this directory and all sub-directories.
+
+        Sizes are aggregated iteratively in post-order, so deep trees don't
+        hit the recursion limit. Returns the total size of this directory.
+        """
+        # Children always come after their parents, so reversing gives post-order.
+        for dir_ in reversed(list(self.iter_dirs())):
+            dir_.total_size = sum(file.size for file in dir_.files.values()) + sum(
+                sub_dir.total_size for sub_dir in dir_.dirs.values()
+            )
+
+        return self.total_size
+
     def calculate_sizes(self) -> dict[Path, int]:
-        """Calculate the size of all directories recursively."""
-        sizes: dict[Path, int] = {}
+        """Calculate the size of all directories."""
+        self.aggregate_sizes()
 
-        def inner(dir_: Dir) -> dict[Path, int]:
-            total_file_size = sum([file.size for file in dir_.files.values()])
-            total_dir_size = sum(
-                [inner(sub_dir).get(sub_dir.path) for sub_dir in dir_.dirs.values()]
+        sizes: dict[Path, int] = {}
+        # Build each path from its parent's, rather than walking up every time.
+        stack = [(self, self.path)]
+        while stack:
+            dir_, path = stack.pop()
+            sizes[path] = dir_.total_size
+            stack.extend(
+                (sub_dir, path / sub_dir.name) for sub_dir in dir_.dirs.values()
             )
-            total_size = total_file_size + total_dir_size
-            sizes.update({dir_.path: total_size})
 
-            return sizes
+        return sizes
+
+    def add_file(self, file: File) -> None:
+        """Add a file to this directory and update the cached sizes above it.
+
+        A file with the same name is replaced, and its size no longer counted.
+        """
+        key = self._child_key(file.name)
+        previous = self.files.get(key)
+        file.parent = self
+        self.files[key] = file
+        self._propagate_size(file.size - (previous.size if previous else 0))
+
+    def add_dir(self, dir_: Dir) -> None:
+        """Add a directory to this directory and update the cached sizes above it.
+
+        A directory with the same name is replaced, along with everything in it.
+        """
+        key = self._child_key(dir_.name)
+        previous = self.dirs.get(key)
+        dir_.parent = self
+        dir_.aggregate_sizes()
+        self.dirs[key] = dir_
+
+        index = self._root().size_index
+        if index:
+            if previous:
+                for sub_dir in previous.iter_dirs():
+                    index.remove(sub_dir.total_size)
+            for sub_dir in dir_.iter_dirs():
+                index.add(sub_dir.total_size)
+
+        if previous and previous is not dir_:
+            previous.parent = None
+        self._propagate_size(dir_.total_size - (previous.total_size if previous else 0))
+
+    def _child_key(self, name: str) -> Path | str:
+        """Return the key a child with this name is stored under.
+
+        Trees built by parse_directory_tree_from_stdout key children by name,
+        while those from parse_directory_structure_from_stdout key them by path.
+        """
+        return self.path / name if self.keyed_by_path else name
+
+    def _root(self) -> Dir:
+        """Return the root of the tree this directory is in."""
+        dir_ = self
+        while dir_.parent:
+            dir_ = dir_.parent
+        return dir_
 
-        return inner(self)
+    def _propagate_size(self, delta: int) -> None:
+        """Push a change in size up the parent chain to the root."""
+        changes: list[tuple[int, int]] = []
+        dir_ = self
+        while True:
+            changes.append((dir_.total_size, dir_.total_size + delta))
+            dir_.total_size += delta
+            if not dir_.parent:
+                break
+            dir_ = dir_.parent
+
+        if dir_.size_index and delta:
+            for old_size, new_size in changes:
+                dir_.size_index.replace(old_size, new_size)
+
+
+class DirSizeIndex:
+    """A sorted index of the cached directory sizes in a tree.
+
+    Once attached to the root, it is kept up to date by Dir.add_file and
+    Dir.add_dir, so size queries can be answered after every change without
+    walking the tree again.
+    """
+
+    def __init__(self, root: Dir):
+        """Aggregate the tree sizes and attach the index to the root."""
+        root.aggregate_sizes()
+        self.sizes = sorted(dir_.total_size for dir_ in root.iter_dirs())
+        root.size_index = self
+
+    def add(self, size: int) -> None:
+        """Add a directory size to the index."""
+        insort(self.sizes, size)
+
+    def remove(self, size: int) -> None:
+        """Remove a directory size from the index."""
+        del self.sizes[bisect_left(self.sizes, size)]
+
+    def replace(self, old_size: int, new_size: int) -> None:
+        """Replace one directory size in the index with another."""
+        del self.sizes[bisect_left(self.sizes, old_size)]
+        insort(self.sizes, new_size)
+
+    def sum_at_most(self, limit: int) -> int:
+        """Return the sum of all directory sizes no greater than the limit."""
+        return sum(self.sizes[: bisect_right(self.sizes, limit)])
+
+    def smallest_at_least(self, target: int) -> Optional[int]:
+        """Return the smallest directory size of at least the target."""
+        i = bisect_left(self.sizes, target)
+        return self.sizes[i] if i < len(self.sizes) else None
 
 
 def parse_directory_structure_from_stdout(stdout: list[str]) -> dict[Path, Dir | File]:
-    """Parse the directory structure from a list of stdout messages."""
+    """Parse the directory structure from a list of stdout messages.
+
+    Sub-dirs and files are keyed by their paths, and the directory sizes are
+    aggregated before returning.
+    """
     dir_structure: dict[Path, Dir | File] = {}
     for line in stdout:
         match RegexEqual(line):
@@ -72,12 +206,14 @@ def parse_directory_structure_from_stdout(stdout: list[str]) -> dict[Path, Dir |
                 new_dir_name = re.search(r"(?<=cd\s).+", line)[0]
                 match new_dir_name:
                     case "/":
-                        home_dir = Dir(name=new_dir_name)
+                        home_dir = Dir(name=new_dir_name, keyed_by_path=True)
                         current_dir = home_dir
                     case "..":
                         current_dir = current_dir.parent
                     case _:
-                        new_dir = Dir(new_dir_name, parent=current_dir)
+                        new_dir = Dir(
+                            new_dir_name, parent=current_dir, keyed_by_path=True
+                        )
                         current_dir.dirs.update({new_dir.path: new_dir})
                         current_dir = new_dir
 
@@ -89,39 +225,236 @@ def parse_directory_structure_from_stdout(stdout: list[str]) -> dict[Path, Dir |
                 current_dir.files.update({file.path: file})
             case r"^dir":  # Is a directory
                 new_dir_name = re.split(r" ", line)[-1]
-                new_dir = Dir(new_dir_name, parent=current_dir)
+                new_dir = Dir(new_dir_name, parent=current_dir, keyed_by_path=True)
                 current_dir.dirs.update({new_dir.path: new_dir})
 
+    for dir_ in dir_structure.values():
+        if not dir_.parent:
+            dir_.aggregate_sizes()
+
     return dir_structure
 
 
+def iter_stdout_events(stdout: list[str]) -> Iterator[tuple[str, str, int]]:
+    """Yield a (kind, name, size) event for each meaningful stdout message.
+
+    Lines are dispatched on their prefix, so no regexes are evaluated. The
+    kind is "cd" for a change of directory (including "/" and ".."), "dir"
+    for a listed sub-directory, or "file" for a listed file. Sizes are 0 for
+    everything but files, and names are interned.
+    """
+    for line in stdout:
+        if line.startswith("$ cd "):
+            yield "cd", sys.intern(line[5:]), 0
+        elif line.startswith("$"):  # ls, which lists the current directory
+            continue
+        elif line.startswith("dir "):
+            yield "dir", sys.intern(line[4:]), 0
+        elif line:  # Is a file with format: 476347 filename.ext
+            file_size, file_name = line.split(" ", 1)
+            yield "file", sys.intern(file_name), int(file_size)
+
+
+def parse_directory_tree_from_stdout(stdout: list[str]) -> Dir:
+    """Parse the directory tree from a list of stdout messages in a single pass.
+
+    The current directory is kept on an explicit stack, so no paths are
+    evaluated. Sub-dirs and files are keyed by their interned names rather
+    than their paths.
+
+    Returns the root directory, with the directory sizes aggregated.
+    """
+    root = Dir(name="/")
+    cwd_stack: list[Dir] = [root]
+
+    for kind, name, size in iter_stdout_events(stdout):
+        current_dir = cwd_stack[-1]
+        if kind == "file":
+            current_dir.files[name] = File(name, size, current_dir)
+        elif kind == "dir" or name not in ("/", ".."):
+            if name not in current_dir.dirs:
+                current_dir.dirs[name] = Dir(name, current_dir)
+            if kind == "cd":
+                cwd_stack.append(current_dir.dirs[name])
+        elif name == "/":
+            del cwd_stack[1:]
+        elif len(cwd_stack) > 1:
+            cwd_stack.pop()
+
+    root.aggregate_sizes()
+    return root
+
+
+@dataclass
+class FileSystemIndex:
+    """A compact, array-backed index of a directory tree.
+
+    Directories and files are identified by their position in the columns.
+    Every directory comes after its parent, so sizes can be aggregated in a
+    single reverse pass.
+
+    Attributes:
+        dir_names: The name of each directory.
+        dir_parents: The parent index of each directory (-1 for the root).
+        own_sizes: The total size of the files directly in each directory.
+        subtree_sizes: The total size of each directory.
+        file_names: The name of each file.
+        file_parents: The directory index of each file.
+        file_sizes: The size of each file.
+        sorted_sizes: The directory sizes in ascending order.
+        cumulative_sizes: Prefix sums of sorted_sizes, starting from 0.
+    """
+
+    dir_names: list[str] = field(default_factory=lambda: ["/"])
+    dir_parents: array = field(default_factory=lambda: array("q", [-1]))
+    own_sizes: array = field(default_factory=lambda: array("q", [0]))
+    subtree_sizes: array = field(default_factory=lambda: array("q"))
+    file_names: list[str] = field(default_factory=list)
+    file_parents: array = field(default_factory=lambda: array("q"))
+    file_sizes: array = field(default_factory=lambda: array("q"))
+    sorted_sizes: array = field(default_factory=lambda: array("q"))
+    cumulative_sizes: array = field(default_factory=lambda: array("q"))
+
+    @classmethod
+    def from_stdout(cls, stdout: list[str]) -> FileSystemIndex:
+        """Build the index from a list of stdout messages in a single pass."""
+        index = cls()
+        # Map (parent index, name) to directory and file index while parsing only.
+        children: dict[tuple[int, str], int] = {}
+        files: dict[tuple[int, str], int] = {}
+        cwd_stack = [0]
+
+        for kind, name, size in iter_stdout_events(stdout):
+            if kind == "file":
+                index._add_file(files, cwd_stack[-1], name, size)
+            elif kind == "dir" or name not in ("/", ".."):
+                dir_id = index._add_dir(children, cwd_stack[-1], name)
+                if kind == "cd":
+                    cwd_stack.append(dir_id)
+            elif name == "/":
+                del cwd_stack[1:]
+            elif len(cwd_stack) > 1:
+                cwd_stack.pop()
+
+        index.aggregate_sizes()
+        return index
+
+    def _add_dir(
+        self,
+        children: dict[tuple[int, str], int],
+        parent: int,
+        name: str,
+    ) -> int:
+        """Add a directory if it doesn't exist yet and return its index."""
+        key = (parent, name)
+        if key not in children:
+            children[key] = len(self.dir_names)
+            self.dir_names.append(name)
+            self.dir_parents.append(parent)
+            self.own_sizes.append(0)
+
+        return children[key]
+
+    def _add_file(
+        self,
+        files: dict[tuple[int, str], int],
+        parent: int,
+        name: str,
+        size: int,
+    ) -> None:
+        """Add a file, or update its size if it was already listed."""
+        key = (parent, name)
+        if key in files:
+            file_id = files[key]
+            self.own_sizes[parent] += size - self.file_sizes[file_id]
+            self.file_sizes[file_id] = size
+            return
+
+        files[key] = len(self.file_names)
+        self.file_names.append(name)
+        self.file_parents.append(parent)
+        self.file_sizes.append(size)
+        self.own_sizes[parent] += size
+
+    @classmethod
+    def from_dir(cls, root: Dir) -> FileSystemIndex:
+        """Build the index from an existing Dir tree."""
+        index = cls(dir_names=[], dir_parents=array("q"), own_sizes=array("q"))
+        dir_ids: dict[int, int] = {}
+        # Parents are always yielded before their sub-directories.
+        for dir_ in root.iter_dirs():
+            dir_id = dir_ids[id(dir_)] = len(index.dir_names)
+            index.dir_names.append(dir_.name)
+            index.dir_parents.append(
+                dir_ids[id(dir_.parent)] if dir_ is not root else -1
+            )
+            index.own_sizes.append(0)
+            for file in dir_.files.values():
+                index.file_names.append(file.name)
+                index.file_parents.append(dir_id)
+                index.file_sizes.append(file.size)
+                index.own_sizes[dir_id] += file.size
+
+        index.aggregate_sizes()
+        return index
+
+    def to_dir(self) -> Dir:
+        """Convert the index to a Dir tree and return the root."""
+        dirs: list[Dir] = []
+        for name, parent, size in zip(
+            self.dir_names, self.dir_parents, self.subtree_sizes
+        ):
+            dir_ = Dir(name, dirs[parent] if parent >= 0 else None, total_size=size)
+            if dir_.parent:
+                dir_.parent.dirs[name] = dir_
+            dirs.append(dir_)
+
+        for name, parent, size in zip(
+            self.file_names, self.file_parents, self.file_sizes
+        ):
+            dirs[parent].files[name] = File(name, size, dirs[parent])
+
+        return dirs[0]
+
+    def aggregate_sizes(self) -> None:
+        """Aggregate subtree sizes and build the sorted size index."""
+        self.subtree_sizes = array("q", self.own_sizes)
+        # Children come after their parents, so a reverse pass is post-order.
+        for i in range(len(self.dir_parents) - 1, 0, -1):
+            self.subtree_sizes[self.dir_parents[i]] += self.subtree_sizes[i]
+
+        self.sorted_sizes = array("q", sorted(self.subtree_sizes))
+        self.cumulative_sizes = array("q", accumulate(self.sorted_sizes, initial=0))
+
+    def sum_at_most(self, limit: int) -> int:
+        """Return the sum of all directory sizes no greater than the limit."""
+        return self.cumulative_sizes[bisect_right(self.sorted_sizes, limit)]
+
+    def smallest_at_least(self, target: int) -> Optional[int]:
+        """Return the smallest directory size of at least the target."""
+        i = bisect_left(self.sorted_sizes, target)
+        return self.sorted_sizes[i] if i < len(self.sorted_sizes) else None
+
+
 if __name__ == "__main__":
     with open(get_input_path()) as f:
         stdout = [line.rstrip("\n") for line in f]
 
-    dir_structure = parse_directory_structure_from_stdout(stdout)
-    root_dir: Dir = dir_structure.get(Path("/"))
-    dir_sizes = root_dir.calculate_sizes()
+    root_dir = parse_directory_tree_from_stdout(stdout)
+    dir_sizes = DirSizeIndex(root_dir)
 
     # Solution to part 1
-    good_candidates = {
-        path: size for path, size in dir_sizes.items() if size <= 100_000
-    }
     print("Sum of all directory sizes where the total size is no greater than 100,000:")
-    print(sum(good_candidates.values()))
+    print(dir_sizes.sum_at_most(100_000))
 
     # Solution to part 2
     TOTAL_SPACE = 70000000
-    used_space = dir_sizes.get(Path("/"))
+    used_space = root_dir.total_size
     REQUIRED_SPACE = 30000000
     unused_space = TOTAL_SPACE - used_space
-    if unused_space < REQUIRED_SPACE:
-        target_space = REQUIRED_SPACE - unused_space
+    target_space = max(REQUIRED_SPACE - unused_space, 0)
 
-    deletion_candidates = {
-        dir_: size for dir_, size in dir_sizes.items() if size >= target_space
-    }
     print(
         "Size of smallest directory that if deleted, frees up enough space for the update:"
     )
-    print(min(deletion_candidates.values()))
+    print(dir_sizes.smallest_at_least(target_space))
@@ -1,7 +1,14 @@
 import itertools
-from functools import reduce
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property, reduce
+from multiprocessing import shared_memory
 from operator import mul
-from typing import Any, List, Optional
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
 
 from aoc_helpers import get_input_path
 
@@ -10,6 +17,11 @@ class TreeGrid:
     def __init__(self, grid: List[List[str]]):
         """Initiate the tree grid."""
         self._grid = grid
+        # Parse once into a flat row-major buffer of height characters, which
+        # order the same way as the heights they represent.
+        self.n_rows = len(grid)
+        self.n_cols = len(grid[0]) if grid else 0
+        self.heights = "".join(map("".join, grid)).encode()
 
     @property
     def grid(self):
@@ -56,6 +68,15 @@ class TreeGrid:
 
     def mark_visible(self, marker: str = "^", other: str = ".") -> List[List[str]]:
         """Return a grid of markers where trees are visible from outside."""
+        visible = self.get_visibility()
+        return self._unflatten([marker if v else other for v in visible])
+
+    def mark_visible_reference(
+        self,
+        marker: str = "^",
+        other: str = ".",
+    ) -> List[List[str]]:
+        """Return a grid of visibility markers by checking each tree in turn."""
         # Assume all visible to start.
         visible = self.generate_uniform_grid(marker)
 
@@ -65,6 +86,72 @@ class TreeGrid:
 
         return visible
 
+    def _unflatten(self, values: List[Any]) -> List[List[Any]]:
+        """Split a flat row-major list into rows."""
+        return [
+            values[start : start + self.n_cols]
+            for start in range(0, len(values), self.n_cols)
+        ]
+
+    def _iter_sight_lines(self) -> Iterator[range]:
+        """Yield the flat indices along each row and column, in both directions."""
+        size = self.n_rows * self.n_cols
+        for row_start in range(0, size, self.n_cols):
+            line = range(row_start, row_start + self.n_cols)
+            yield line
+            yield line[::-1]
+
+        for col in range(self.n_cols):
+            line = range(col, size, self.n_cols)
+            yield line
+            yield line[::-1]
+
+    def get_visibility(self) -> bytearray:
+        """Return a flat row-major mask of trees visible from outside the grid.
+
+        Each row and column is swept from both ends with a running max, so the
+        cost is O(rows x cols).
+        """
+        heights = self.heights
+        tallest_possible = max(heights, default=0)
+        visible = bytearray(len(heights))
+        for line in self._iter_sight_lines():
+            tallest = -1
+            for idx in line:
+                if heights[idx] > tallest:
+                    visible[idx] = 1
+                    tallest = heights[idx]
+                    # Nothing further along the line can be seen past this tree.
+                    if tallest == tallest_possible:
+                        break
+
+        return visible
+
+    def get_scenic_scores(self) -> array:
+        """Return a flat row-major array of the scenic score of each tree.
+
+        Viewing distances come from a monotonic stack swept along each row and
+        column in both directions, so the cost is O(rows x cols).
+        """
+        heights = self.heights
+        scores = array("q", [1]) * len(heights)
+        for line in self._iter_sight_lines():
+            # Positions along the line of trees not yet blocked by a taller one.
+            stack: list[int] = []
+            stack_heights: list[int] = []
+            for pos, idx in enumerate(line):
+                height = heights[idx]
+                while stack_heights and stack_heights[-1] < height:
+                    stack.pop()
+                    stack_heights.pop()
+
+                # The view stops at the nearest tree at least as tall, or the edge.
+                scores[idx] *= pos - stack[-1] if stack else pos
+                stack.append(pos)
+                stack_heights.append(height)
+
+        return scores
+
     def _is_visible(self, i: int, j: int) -> bool:
         """Return True if a tree at position is visible from any side."""
         if self.is_on_edge(i, j):
@@ -107,6 +194,10 @@ class TreeGrid:
 
     def calculate_scenic_score_grid(self):
         """Calculate total scenic score for each tree in grid."""
+        return self._unflatten(self.get_scenic_scores().tolist())
+
+    def calculate_scenic_score_grid_reference(self):
+        """Calculate scenic scores by scanning outwards from each tree in turn."""
         scenic_scores = self.generate_uniform_grid(0)
         for i, j in itertools.product(range(self.len_x), range(self.len_y)):
             scenic_scores[i][j] = self._get_scenic_score(i, j)
@@ -114,19 +205,323 @@ class TreeGrid:
         return scenic_scores
 
 
-if __name__ == "__main__":
-    with open(get_input_path()) as f:
-        grid = [line.rstrip("\n") for line in f]
+class NumpyTreeGrid:
+    """A NumPy backend for TreeGrid that holds the heights in a uint8 array."""
+
+    def __init__(self, heights: np.ndarray):
+        """Initiate the tree grid from a 2D array of heights."""
+        self.heights = heights
+        self.n_rows, self.n_cols = heights.shape
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "NumpyTreeGrid":
+        """Load the grid from raw file bytes with a single np.frombuffer."""
+        if not data.endswith(b"\n"):
+            data += b"\n"
+        n_cols = data.index(b"\n")
+        chars = np.frombuffer(data, dtype=np.uint8).reshape(-1, n_cols + 1)
+        # Drop the newline column and convert digit characters to heights.
+        return cls(chars[:, :n_cols] - ord("0"))
+
+    @classmethod
+    def from_file(cls, path: str) -> "NumpyTreeGrid":
+        """Load the grid from a file."""
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @staticmethod
+    def _visible_from_left(heights: np.ndarray) -> np.ndarray:
+        """Return a mask of trees taller than every tree to their left."""
+        tallest_before = np.full(heights.shape, -1, dtype=np.int16)
+        tallest_before[:, 1:] = np.maximum.accumulate(heights, axis=1)[:, :-1]
+        return heights > tallest_before
+
+    @staticmethod
+    def _viewing_distances_left(heights: np.ndarray) -> np.ndarray:
+        """Return the viewing distance to the left of each tree.
+
+        Scans once per possible height, finding the nearest tree to the left
+        at least that tall with a cumulative max over column indices.
+        """
+        cols = np.arange(heights.shape[1], dtype=np.int32)
+        distances = np.zeros(heights.shape, dtype=np.int32)
+        blockers = np.empty(heights.shape, dtype=np.int32)
+        for height in range(10):
+            # Trees that block the view are marked with their column, others
+            # with the edge column 0, so the cumulative max is the nearest one.
+            np.multiply(heights >= height, cols, out=blockers)
+            np.maximum.accumulate(blockers, axis=1, out=blockers)
+            # Edge trees keep a distance of 0.
+            np.subtract(
+                cols[1:],
+                blockers[:, :-1],
+                out=distances[:, 1:],
+                where=(heights == height)[:, 1:],
+            )
+
+        return distances
+
+    def get_visibility(self) -> np.ndarray:
+        """Return a boolean grid of trees visible from outside the grid."""
+        h = self.heights
+        return (
+            self._visible_from_left(h)
+            | self._visible_from_left(h[:, ::-1])[:, ::-1]
+            | self._visible_from_left(h.T).T
+            | self._visible_from_left(h.T[:, ::-1])[:, ::-1].T
+        )
+
+    def get_scenic_scores(self) -> np.ndarray:
+        """Return a grid of the scenic score of each tree."""
+        h = self.heights
+        scores = self._viewing_distances_left(h).astype(np.int64)
+        scores *= self._viewing_distances_left(h[:, ::-1])[:, ::-1]
+        scores *= self._viewing_distances_left(h.T).T
+        scores *= self._viewing_distances_left(h.T[:, ::-1])[:, ::-1].T
+        return scores
+
+    def mark_visible(self, marker: str = "^", other: str = ".") -> List[List[str]]:
+        """Return a grid of markers where trees are visible from outside."""
+        return np.where(self.get_visibility(), marker, other).tolist()
+
+    def calculate_scenic_score_grid(self):
+        """Calculate total scenic score for each tree in grid."""
+        return self.get_scenic_scores().tolist()
+
 
-    tree_grid = TreeGrid(grid)
+# Name and shape of a grid held in shared memory, as passed to workers.
+SharedGridSpec = tuple[str, tuple[int, int]]
+
+
+def _attach(
+    spec: SharedGridSpec, dtype: type
+) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Attach to a shared memory block and view it as an array."""
+    name, shape = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _visible_from_top(heights: np.ndarray, carry_max: np.ndarray) -> np.ndarray:
+    """Return a mask of trees taller than every tree above them.
+
+    carry_max holds the tallest tree in each column above the strip, or -1.
+    """
+    tallest_before = np.empty(heights.shape, dtype=np.int16)
+    tallest_before[0] = carry_max
+    tallest_before[1:] = np.maximum(
+        np.maximum.accumulate(heights[:-1], axis=0), carry_max
+    )
+    return heights > tallest_before
+
+
+def _viewing_distances_top(
+    heights: np.ndarray,
+    rows: np.ndarray,
+    carry: np.ndarray,
+) -> np.ndarray:
+    """Return the viewing distance above each tree in a strip of rows.
+
+    rows holds the row number of each strip row counted from the top edge, and
+    carry[height] the row of the nearest tree at least that tall above the
+    strip in each column, or 0 for the edge.
+    """
+    distances = np.zeros(heights.shape, dtype=np.int32)
+    blockers = np.empty(heights.shape, dtype=np.int32)
+    nearest_blocker = np.empty(heights.shape, dtype=np.int32)
+    for height in range(10):
+        np.multiply(heights >= height, rows[:, None], out=blockers)
+        np.maximum.accumulate(blockers, axis=0, out=blockers)
+        nearest_blocker[0] = carry[height]
+        np.maximum(blockers[:-1], carry[height], out=nearest_blocker[1:])
+        np.subtract(
+            rows[:, None],
+            nearest_blocker,
+            out=distances,
+            where=heights == height,
+        )
+
+    return distances
+
+
+def _summarise_strip(spec: SharedGridSpec, start: int, stop: int) -> tuple:
+    """Return the carry state a strip of rows passes to the strips around it.
+
+    That is the tallest tree in each column, and for each height the row of
+    the furthest tree at least that tall, counted from the top and bottom.
+    """
+    shm, grid = _attach(spec, np.uint8)
+    try:
+        heights = grid[start:stop]
+        rows_from_top = np.arange(start, stop, dtype=np.int32)[:, None]
+        rows_from_bottom = len(grid) - 1 - rows_from_top
+        col_max = heights.max(axis=0)
+        last_from_top = np.stack(
+            [((heights >= h) * rows_from_top).max(axis=0) for h in range(10)]
+        )
+        last_from_bottom = np.stack(
+            [((heights >= h) * rows_from_bottom).max(axis=0) for h in range(10)]
+        )
+    finally:
+        del grid, heights
+        shm.close()
+
+    return col_max, last_from_top, last_from_bottom
+
+
+def _process_strip(
+    spec: SharedGridSpec,
+    visible_spec: SharedGridSpec,
+    scores_spec: SharedGridSpec,
+    start: int,
+    stop: int,
+    carries: tuple,
+) -> None:
+    """Write visibility and scenic scores for a strip of rows to shared memory."""
+    top_max, bottom_max, top_carry, bottom_carry = carries
+    shm, grid = _attach(spec, np.uint8)
+    visible_shm, visible = _attach(visible_spec, np.bool_)
+    scores_shm, scores = _attach(scores_spec, np.int64)
+    try:
+        h = grid[start:stop]
+        h_up = h[::-1]
+        rows_from_top = np.arange(start, stop, dtype=np.int32)
+        rows_from_bottom = (len(grid) - 1 - rows_from_top)[::-1]
+
+        # Rows are complete within the strip, so left and right need no carry.
+        visible[start:stop] = (
+            NumpyTreeGrid._visible_from_left(h)
+            | NumpyTreeGrid._visible_from_left(h[:, ::-1])[:, ::-1]
+            | _visible_from_top(h, top_max)
+            | _visible_from_top(h_up, bottom_max)[::-1]
+        )
+
+        strip_scores = NumpyTreeGrid._viewing_distances_left(h).astype(np.int64)
+        strip_scores *= NumpyTreeGrid._viewing_distances_left(h[:, ::-1])[:, ::-1]
+        strip_scores *= _viewing_distances_top(h, rows_from_top, top_carry)
+        strip_scores *= _viewing_distances_top(h_up, rows_from_bottom, bottom_carry)[
+            ::-1
+        ]
+        scores[start:stop] = strip_scores
+    finally:
+        del grid, visible, scores, h, h_up
+        shm.close()
+        visible_shm.close()
+        scores_shm.close()
+
+
+class TiledTreeGrid(NumpyTreeGrid):
+    """A TreeGrid backend that processes strips of rows across processes.
+
+    The grid is shared between workers through shared memory. Each strip
+    first reports a small carry state (column maxima and the furthest tall
+    tree per height), which is stitched together so every strip can then
+    see past its top and bottom boundaries.
+    """
+
+    def __init__(
+        self,
+        heights: np.ndarray,
+        workers: Optional[int] = None,
+        strip_rows: Optional[int] = None,
+    ):
+        """Initiate the tree grid from a 2D array of heights."""
+        super().__init__(heights)
+        self.workers = workers or os.cpu_count() or 1
+        self.strip_rows = strip_rows or max(1, -(-self.n_rows // self.workers))
+
+    def get_visibility(self) -> np.ndarray:
+        """Return a boolean grid of trees visible from outside the grid."""
+        return self._results[0]
+
+    def get_scenic_scores(self) -> np.ndarray:
+        """Return a grid of the scenic score of each tree."""
+        return self._results[1]
+
+    @cached_property
+    def _results(self) -> tuple[np.ndarray, np.ndarray]:
+        """Compute visibility and scenic scores for all strips in the pool."""
+        shape = (self.n_rows, self.n_cols)
+        strips = [
+            (start, min(start + self.strip_rows, self.n_rows))
+            for start in range(0, self.n_rows, self.strip_rows)
+        ]
+        # Blocks for the heights, visibility and scores, sized by bytes per tree.
+        blocks = [
+            shared_memory.SharedMemory(create=True, size=max(1, self.heights.size * n))
+            for n in (1, 1, 8)
+        ]
+        try:
+            spec, visible_spec, scores_spec = [(b.name, shape) for b in blocks]
+            np.ndarray(shape, np.uint8, buffer=blocks[0].buf)[:] = self.heights
+
+            with ProcessPoolExecutor(self.workers) as pool:
+                summaries = list(
+                    pool.map(_summarise_strip, [spec] * len(strips), *zip(*strips))
+                )
+                jobs = [
+                    pool.submit(
+                        _process_strip,
+                        spec,
+                        visible_spec,
+                        scores_spec,
+                        *strip,
+                        self._stitch(summaries, i),
+                    )
+                    for i, strip in enumerate(strips)
+                ]
+                for job in jobs:
+                    job.result()
+
+            visible = np.ndarray(shape, np.bool_, buffer=blocks[1].buf).copy()
+            scores = np.ndarray(shape, np.int64, buffer=blocks[2].buf).copy()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        return visible, scores
+
+    def _stitch(self, summaries: list[tuple], i: int) -> tuple:
+        """Combine the carry state of the strips above and below strip i."""
+        no_max = np.full(self.n_cols, -1, dtype=np.int16)
+        no_blocker = np.zeros((10, self.n_cols), dtype=np.int32)
+        above, below = summaries[:i], summaries[i + 1 :]
+        return (
+            np.max([no_max, *(s[0] for s in above)], axis=0),
+            np.max([no_max, *(s[0] for s in below)], axis=0),
+            np.max([no_blocker, *(s[1] for s in above)], axis=0),
+            np.max([no_blocker, *(s[2] for s in below)], axis=0),
+        )
+
+
+def benchmark_tiled_tree_grid(
+    size: int = 4000,
+    worker_counts: tuple[int, ...] = (1, 2, 4, 8),
+) -> dict[int, float]:
+    """Time TiledTreeGrid on a random square grid for each worker count."""
+    heights = np.random.default_rng(0).integers(0, 10, (size, size), dtype=np.uint8)
+    timings = {}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        tree_grid = TiledTreeGrid(heights, workers=workers)
+        tree_grid.get_visibility()
+        tree_grid.get_scenic_scores()
+        timings[workers] = time.perf_counter() - start
+        print(f"{workers} workers: {timings[workers]:.2f}s")
+
+    return timings
+
+
+if __name__ == "__main__":
+    tree_grid = NumpyTreeGrid.from_file(get_input_path())
     visible_trees = tree_grid.mark_visible(marker="^", other=".")
     print(*list(map("".join, visible_trees)), sep="\n")
 
     # Solution to part 1
     print("The total number of trees visibile from outside the grid is:")
-    print(sum(x == "^" for x in itertools.chain.from_iterable(visible_trees)))
+    print(tree_grid.get_visibility().sum())
 
     # Solution to part 2
-    scenic_scores = tree_grid.calculate_scenic_score_grid()
     print("The highest scenic score possible for any tree is:")
-    print(max(itertools.chain.from_iterable(scenic_scores)))
+    print(tree_grid.get_scenic_scores().max())
@@ -1,11 +1,41 @@
 import itertools
+import sys
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
-from typing import Literal, Self, Tuple
+from typing import BinaryIO, Iterable, Iterator, Literal, Optional, Self, Tuple
 
 from aoc_helpers import get_input_path
 
 Direction = Literal["U", "D", "R", "L"]
 
+# The (x, y) step taken by the head for each direction.
+DIRECTION_STEPS: dict[Direction, Tuple[int, int]] = {
+    "U": (0, 1),
+    "D": (0, -1),
+    "R": (1, 0),
+    "L": (-1, 0),
+}
+
+# Offset that makes 32-bit signed coordinates non-negative for packing.
+COORD_OFFSET = 1 << 31
+
+
+def pack_position(x: int, y: int) -> int:
+    """Pack an (x, y) position into a single 64-bit integer key.
+
+    Raises a ValueError if either coordinate doesn't fit in 32 signed bits,
+    rather than letting it corrupt the other half of the key.
+    """
+    if not (-COORD_OFFSET <= x < COORD_OFFSET and -COORD_OFFSET <= y < COORD_OFFSET):
+        raise ValueError(f"Position ({x}, {y}) is out of the 32-bit packing range.")
+    return ((x + COORD_OFFSET) << 32) | (y + COORD_OFFSET)
+
+
+def unpack_position(key: int) -> Tuple[int, int]:
+    """Unpack a 64-bit integer key into an (x, y) position."""
+    return (key >> 32) - COORD_OFFSET, (key & 0xFFFFFFFF) - COORD_OFFSET
+
 
 @dataclass
 class Position:
@@ -72,13 +102,46 @@ class Rope:
 
 
 class RopeTracker:
-    def __init__(self, knots: int):
+    def __init__(
+        self,
+        knots: int,
+        track_knots: Iterable[int] = (),
+        history: bool = False,
+        history_every: int = 1,
+        history_limit: Optional[int] = None,
+        renderer: Optional["RopeRenderer"] = None,
+    ):
+        """Initialise the rope tracker.
+
+        Args:
+            knots: The number of knots in the rope.
+            track_knots: Indices of knots to record visited cells for, as
+                well as the tail.
+            history: Whether to keep full rope snapshots, as needed by
+                visualise.
+            history_every: Keep a snapshot only every this many steps.
+            history_limit: Keep at most this many of the latest snapshots.
+            renderer: A renderer to stream a frame to at every step.
+        """
         self.n_knots = knots
         self.rope: list[Position] = [Position() for _ in range(knots)]
-        self.positions: list[list[Position]] = []
+        # Visited cells for each tracked knot, as packed position keys.
+        self.visited: dict[int, set[int]] = {
+            i % knots: set() for i in (knots - 1, *track_knots)
+        }
+        self.history = history
+        self.history_every = history_every
+        self.positions: deque[list[Tuple[int, int]]] = deque(maxlen=history_limit)
+        self.renderer = renderer
+        self.steps = 0
         # Take initial snapshot for starting positions.
         self.snapshot()
 
+    @property
+    def tail_visited(self) -> set[int]:
+        """The cells visited by the tail, as packed position keys."""
+        return self.visited[self.n_knots - 1]
+
     def apply_motion(self, direction: Direction, steps: int) -> None:
         """Step in the direction for the given number of steps."""
         for _ in range(steps):
@@ -88,74 +151,352 @@ class RopeTracker:
                 previous_knot = self.rope[i]
                 rope = Rope(previous_knot, knot)
                 rope.move_tail(direction)
+            self.steps += 1
             self.snapshot()
 
     def snapshot(self):
-        """Save the position of the head and tail."""
-        self.positions.append([knot.snapshot() for knot in self.rope])
+        """Record the cells of tracked knots, and the rope if keeping history."""
+        for i, cells in self.visited.items():
+            cells.add(pack_position(self.rope[i].x, self.rope[i].y))
+
+        if self.history and self.steps % self.history_every == 0:
+            self.positions.append([knot.snapshot() for knot in self.rope])
 
-    def visualise(self):
+        if self.renderer:
+            self.renderer.draw(self.rope)
+
+    def visualise(self, out: Optional[BinaryIO] = None):
         """Visualise each snapshot of the rope on a grid."""
-        all_positions = list(itertools.chain.from_iterable(rope_tracker.positions))
-        min_x = min(all_positions, key=lambda x: x[0])[0]
-        max_x = max(all_positions, key=lambda x: x[0])[0]
-        min_y = min(all_positions, key=lambda x: x[1])[1]
-        max_y = max(all_positions, key=lambda x: x[1])[1]
-
-        knot_markers = ["H", *[str(i) for i in range(1, self.n_knots - 1)], "T"]
-        start_x = abs(min_x) + self.positions[0][0][0]
-        start_y = abs(max_y) - self.positions[0][0][1]
+        if not self.positions:
+            raise ValueError("Visualising requires a RopeTracker with history=True.")
+
+        all_positions = itertools.chain.from_iterable(self.positions)
+        min_x, max_x, min_y, max_y = 0, 0, 0, 0
+        for x, y in all_positions:
+            min_x, max_x = min(min_x, x), max(max_x, x)
+            min_y, max_y = min(min_y, y), max(max_y, y)
+
+        if out is None:
+            # Flush any pending text so it isn't written after the frames.
+            sys.stdout.flush()
+            out = sys.stdout.buffer
+
+        renderer = RopeRenderer(out, self.n_knots, (min_x, max_x, min_y, max_y))
         for rope_position in self.positions:
-            grid = generate_uniform_grid(
-                abs(min_x) + abs(max_x) + 1,
-                abs(min_y) + abs(max_y) + 1,
-                fill_val=".",
-            )
-            grid[start_y][start_x] = "s"
-            # Go in reverse:
-            for marker, knot_position in zip(knot_markers[::-1], rope_position[::-1]):
-                x_pos = abs(min_x) + knot_position[0]
-                y_pos = abs(max_y) - knot_position[1]
-                grid[y_pos][x_pos] = marker
-            print(*["".join(row) for row in grid], sep="\n")
-            print("\n")
-
-
-def generate_uniform_grid(x, y, fill_val: None):
-    """Generate a uniform filled grid in the same shape as self.grid."""
-    return [[fill_val for _ in range(x)] for _ in range(y)]
+            renderer.draw(Position(x, y) for x, y in rope_position)
+
+        renderer.out.flush()
+
+
+class RopeRenderer:
+    """Streams frames of a rope to a binary file or pipe as it moves.
+
+    One frame buffer is allocated up front and reused. Between frames only
+    the cells the knots left and moved onto are redrawn.
+    """
+
+    def __init__(
+        self,
+        out: BinaryIO,
+        n_knots: int,
+        viewport: Tuple[int, int, int, int],
+        every: int = 1,
+    ):
+        """Initialise the renderer.
+
+        Args:
+            out: The binary stream to write frames to.
+            n_knots: The number of knots in the rope.
+            viewport: The (min_x, max_x, min_y, max_y) of the cells to draw.
+                Knots outside it are not drawn.
+            every: Only write every this many frames.
+        """
+        self.out = out
+        self.every = every
+        self.min_x, self.max_x, self.min_y, self.max_y = viewport
+        self.row_length = self.max_x - self.min_x + 2
+        height = self.max_y - self.min_y + 1
+        self.frame = bytearray((b"." * (self.row_length - 1) + b"\n") * height)
+        self.start = self._offset(0, 0)
+        if self.start is not None:
+            self.frame[self.start] = ord("s")
+
+        middle = [str(i % 10) for i in range(1, n_knots - 1)]
+        self.knot_markers = [ord(m) for m in ["H", *middle, "T"][:n_knots]]
+        self.drawn: list[int] = []
+        self.n_frames = 0
+
+    def _offset(self, x: int, y: int) -> Optional[int]:
+        """Return the offset of a cell in the frame, or None if out of view."""
+        if self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y:
+            return (self.max_y - y) * self.row_length + (x - self.min_x)
+        return None
+
+    def draw(self, rope: Iterable[Position]) -> None:
+        """Draw the rope into the frame and write it out."""
+        self.n_frames += 1
+        if (self.n_frames - 1) % self.every:
+            return
+
+        # Clear the cells drawn last frame.
+        for offset in self.drawn:
+            self.frame[offset] = ord("s") if offset == self.start else ord(".")
+        self.drawn.clear()
+
+        # Draw in reverse so the head is drawn on top.
+        for marker, knot in reversed(list(zip(self.knot_markers, rope))):
+            offset = self._offset(knot.x, knot.y)
+            if offset is not None:
+                self.frame[offset] = marker
+                self.drawn.append(offset)
+
+        self.out.write(self.frame)
+        self.out.write(b"\n\n")
+
+
+class RopeSimulator:
+    """A rope simulation core that updates knot coordinates in place.
+
+    Knot coordinates are held in two flat lists, and followers move with
+    integer sign arithmetic. A step stops propagating down the rope as soon
+    as a knot doesn't move, since none of the knots behind it will either.
+    """
+
+    def __init__(self, knots: int):
+        self.n_knots = knots
+        self.xs: list[int] = [0] * knots
+        self.ys: list[int] = [0] * knots
+        # Visited cells as packed position keys.
+        self.tail_visited: set[int] = {pack_position(0, 0)}
+
+    def apply_motion(self, direction: Direction, steps: int) -> None:
+        """Step in the direction for the given number of steps."""
+        dx, dy = DIRECTION_STEPS[direction]
+        xs, ys = self.xs, self.ys
+        knots = range(1, self.n_knots)
+        tail = self.n_knots - 1
+
+        for _ in range(steps):
+            xs[0] += dx
+            ys[0] += dy
+            for i in knots:
+                gap_x = xs[i - 1] - xs[i]
+                gap_y = ys[i - 1] - ys[i]
+                if -1 <= gap_x <= 1 and -1 <= gap_y <= 1:
+                    # Still touching, so the rest of the rope stays put.
+                    break
+                xs[i] += (gap_x > 0) - (gap_x < 0)
+                ys[i] += (gap_y > 0) - (gap_y < 0)
+            else:
+                self.tail_visited.add(pack_position(xs[tail], ys[tail]))
+
+
+def merge_intervals(intervals: list[Tuple[int, int]]) -> list[Tuple[int, int]]:
+    """Merge inclusive integer intervals that overlap or touch."""
+    merged: list[list[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    return [(start, end) for start, end in merged]
+
+
+class VisitedCells:
+    """A set of visited cells, stored as single cells and straight segments.
+
+    Segments are kept as inclusive intervals along their row or column, so
+    adding one costs O(1) however long it is. Cells are packed position keys.
+    """
+
+    def __init__(self, cells: Iterable[int] = ()):
+        self.cells: set[int] = set(cells)
+        # Horizontal segments as x intervals by row, and vertical by column.
+        self.rows: defaultdict[int, list[Tuple[int, int]]] = defaultdict(list)
+        self.cols: defaultdict[int, list[Tuple[int, int]]] = defaultdict(list)
+
+    def add(self, key: int) -> None:
+        """Add a single cell."""
+        self.cells.add(key)
+
+    def add_segment(self, x: int, y: int, dx: int, dy: int, steps: int) -> None:
+        """Add the cells reached by taking steps of (dx, dy) from (x, y)."""
+        if dy == 0:
+            self.rows[y].append(tuple(sorted((x + dx, x + dx * steps))))
+        else:
+            self.cols[x].append(tuple(sorted((y + dy, y + dy * steps))))
+
+    def __contains__(self, key: int) -> bool:
+        x, y = unpack_position(key)
+        return (
+            key in self.cells
+            or any(start <= x <= end for start, end in self.rows.get(y, []))
+            or any(start <= y <= end for start, end in self.cols.get(x, []))
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over the packed key of every cell, expanding the segments."""
+        seen = set(self.cells)
+        for y, intervals in self.rows.items():
+            for start, end in intervals:
+                seen.update(pack_position(x, y) for x in range(start, end + 1))
+        for x, intervals in self.cols.items():
+            for start, end in intervals:
+                seen.update(pack_position(x, y) for y in range(start, end + 1))
+
+        return iter(seen)
+
+    def __len__(self) -> int:
+        """Count the unique cells without expanding the segments.
+
+        That is the horizontal plus vertical cells, less the cells where they
+        cross, plus the single cells not covered by either.
+        """
+        rows = {y: merge_intervals(intervals) for y, intervals in self.rows.items()}
+        cols = {x: merge_intervals(intervals) for x, intervals in self.cols.items()}
+        n_segment_cells = sum(
+            end - start + 1
+            for merged in itertools.chain(rows.values(), cols.values())
+            for start, end in merged
+        )
+
+        n_single_cells = 0
+        for key in self.cells:
+            x, y = unpack_position(key)
+            if not (_covers(rows.get(y, []), x) or _covers(cols.get(x, []), y)):
+                n_single_cells += 1
+
+        return n_segment_cells - _count_crossings(rows, cols) + n_single_cells
+
+
+def _covers(merged: list[Tuple[int, int]], value: int) -> bool:
+    """Return True if a value lies in one of the merged intervals."""
+    i = bisect_right(merged, (value, float("inf"))) - 1
+    return i >= 0 and merged[i][1] >= value
+
+
+def _count_crossings(
+    rows: dict[int, list[Tuple[int, int]]],
+    cols: dict[int, list[Tuple[int, int]]],
+) -> int:
+    """Count the cells covered by both a horizontal and a vertical segment.
+
+    Sweeps along x keeping a Fenwick tree of the rows with an active
+    horizontal segment, and counts the active rows spanned by each vertical
+    segment.
+    """
+    ys = sorted(rows)
+    tree = [0] * (len(ys) + 1)
+
+    def update(y: int, delta: int) -> None:
+        i = bisect_left(ys, y) + 1
+        while i <= len(ys):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(i: int) -> int:
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    # At the same x, segments start and stop before any vertical is counted.
+    events = [(x1, 0, y, 1) for y, merged in rows.items() for x1, _ in merged]
+    events += [(x2 + 1, 0, y, -1) for y, merged in rows.items() for _, x2 in merged]
+    events += [(x, 1, y1, y2) for x, merged in cols.items() for y1, y2 in merged]
+
+    crossings = 0
+    for _, is_query, a, b in sorted(events):
+        if is_query:
+            crossings += prefix(bisect_right(ys, b)) - prefix(bisect_left(ys, a))
+        else:
+            update(a, b)
+
+    return crossings
+
+
+class SegmentRopeSimulator(RopeSimulator):
+    """A rope simulator that moves a taut rope a whole segment at a time.
+
+    Once every knot sits one step behind the one before it in the direction
+    of motion, each further step just translates the whole rope. The rest of
+    the motion is then applied in one go, and the cells the tail passes over
+    are recorded as a single segment.
+    """
+
+    def __init__(self, knots: int):
+        super().__init__(knots)
+        self.tail_visited: VisitedCells = VisitedCells(self.tail_visited)
+
+    def apply_motion(self, direction: Direction, steps: int) -> None:
+        """Step in the direction for the given number of steps."""
+        if steps <= self.n_knots:
+            # Too short for skipping ahead to pay off, so just step through it.
+            super().apply_motion(direction, steps)
+            return
+
+        dx, dy = DIRECTION_STEPS[direction]
+        xs, ys = self.xs, self.ys
+        tail = self.n_knots - 1
+        while steps:
+            # A taut rope has its head one step per link ahead of its tail.
+            # Each step closes the gap along the motion by at most 2, and the
+            # gap across it by at most 1, so skip the steps that can't get
+            # there and only do the full check once the ends line up.
+            gap_x, gap_y = xs[0] - xs[tail], ys[0] - ys[tail]
+            along = gap_x * dx + gap_y * dy
+            across = abs(gap_x * dy - gap_y * dx)
+            min_steps = max(across, (tail - along + 1) // 2)
+            if not min_steps and self._is_taut(dx, dy):
+                break
+            chunk = min(max(min_steps, 1), steps)
+            super().apply_motion(direction, chunk)
+            steps -= chunk
+
+        if not steps:
+            return
+
+        self.tail_visited.add_segment(self.xs[tail], self.ys[tail], dx, dy, steps)
+        for i in range(self.n_knots):
+            self.xs[i] += dx * steps
+            self.ys[i] += dy * steps
+
+    def _is_taut(self, dx: int, dy: int) -> bool:
+        """Return True if the rope is stretched straight in the given direction."""
+        xs, ys = self.xs, self.ys
+        return all(
+            xs[i - 1] - xs[i] == dx and ys[i - 1] - ys[i] == dy
+            for i in range(1, self.n_knots)
+        )
 
 
 if __name__ == "__main__":
     with open(get_input_path()) as f:
-        motions = [line.rstrip("\n") for line in f]
+        motions = [line.rstrip("\n").split(" ") for line in f]
 
-    rope_tracker = RopeTracker(knots=2)
-
-    for motion in motions:
-        direction, steps = motion.split(" ")
-        steps = int(steps)
-        rope_tracker.apply_motion(direction, steps)
+    motions = [(direction, int(steps)) for direction, steps in motions]
 
     # Solution to part 1
-    # The tail is the final position so index at -1.
-    print("The amount of unique positions that the tail of the 2-knot rope visits is:")
-    print(len({x[-1] for x in rope_tracker.positions}))
+    rope = SegmentRopeSimulator(knots=2)
+    for direction, steps in motions:
+        rope.apply_motion(direction, steps)
 
-    # Best to only visualise with the test input.
-    # rope_tracker.visualise()
+    print("The amount of unique positions that the tail of the 2-knot rope visits is:")
+    print(len(rope.tail_visited))
 
     # Solution to part 2
-    rope_tracker = RopeTracker(knots=10)
-
-    for motion in motions:
-        direction, steps = motion.split(" ")
-        steps = int(steps)
-        rope_tracker.apply_motion(direction, steps)
+    rope = SegmentRopeSimulator(knots=10)
+    for direction, steps in motions:
+        rope.apply_motion(direction, steps)
 
-    # Solution to part 2
     print("The amount of unique positions that the tail of the 10-knot rope visits is:")
-    print(len({x[-1] for x in rope_tracker.positions}))
-
-    # Best to only visualise with the test input.
-    # rope_tracker.visualise()
+    print(len(rope.tail_visited))
+
+    # Best to only visualise with the test input, or stream frames for a
+    # viewport of a larger simulation as it runs.
+    # renderer = RopeRenderer(sys.stdout.buffer, 10, (-20, 20, -10, 10), every=10)
+    # rope_tracker = RopeTracker(knots=10, renderer=renderer)
+    # for direction, steps in motions:
+    #     rope_tracker.apply_motion(direction, steps)
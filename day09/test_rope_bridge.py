@@ -0,0 +1,27 @@
+import random
+
+import pytest
+
+from rope_bridge import RopeSimulator, SegmentRopeSimulator
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_segment_simulator_matches_rope_simulator(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        knots = rng.randint(1, 12)
+        max_steps = rng.choice((3, 30))
+        motions = [
+            (rng.choice("UDRL"), rng.randint(1, max_steps))
+            for _ in range(rng.randint(0, 40))
+        ]
+
+        expected = RopeSimulator(knots)
+        actual = SegmentRopeSimulator(knots)
+        for direction, steps in motions:
+            expected.apply_motion(direction, steps)
+            actual.apply_motion(direction, steps)
+            assert (actual.xs, actual.ys) == (expected.xs, expected.ys), motions
+
+        assert len(actual.tail_visited) == len(expected.tail_visited), motions
+        assert set(actual.tail_visited) == expected.tail_visited, motions
@@ -1,15 +1,101 @@
+import math
+from array import array
 from dataclasses import dataclass, field
-from operator import itemgetter
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
 
 from aoc_helpers.core import get_input_path
 
 
+class FrameBuffer:
+    """A CRT framebuffer that packs pixels into bits.
+
+    Rows are packed most significant bit first and padded to whole bytes.
+    With more than one frame, pixels past the end of a frame go on to the
+    next, and wrap back round to the first frame once all are full.
+    """
+
+    def __init__(self, width: int = 40, height: int = 6, n_frames: int = 1):
+        """Allocate the buffer for all frames up front."""
+        self.width = width
+        self.height = height
+        self.n_frames = n_frames
+        self.row_bytes = (width + 7) // 8
+        self.frame_bytes = self.row_bytes * height
+        self.buffer = bytearray(self.frame_bytes * n_frames)
+        # Lookup from a packed byte to its 8 pixel characters, per on/off pair.
+        self._row_luts: dict[tuple[bytes, bytes], list[bytes]] = {}
+
+    def set_pixel(self, pixel: int, lit: bool) -> None:
+        """Set a pixel, indexed by the cycle it was drawn in counting from 0."""
+        frame, frame_pixel = divmod(pixel, self.width * self.height)
+        row, col = divmod(frame_pixel, self.width)
+        offset = (
+            (frame % self.n_frames) * self.frame_bytes + row * self.row_bytes + col // 8
+        )
+        bit = 0x80 >> (col % 8)
+        if lit:
+            self.buffer[offset] |= bit
+        else:
+            self.buffer[offset] &= ~bit
+
+    def write_pixels(self, lit: np.ndarray) -> None:
+        """Write a run of pixels, starting from the first pixel of the first frame."""
+        total_pixels = self.width * self.height * self.n_frames
+        for start in range(0, len(lit), total_pixels):
+            self._write_rows(lit[start : start + total_pixels])
+
+    def _write_rows(self, lit: np.ndarray) -> None:
+        """Pack pixels into the buffer a row at a time."""
+        n_full_rows, n_partial = divmod(len(lit), self.width)
+        rows = lit[: n_full_rows * self.width].reshape(n_full_rows, self.width)
+        n_bytes = n_full_rows * self.row_bytes
+        self.buffer[:n_bytes] = np.packbits(rows, axis=1).tobytes()
+
+        if n_partial:
+            # Only overwrite the bits of the pixels in the partial row.
+            bits = np.packbits(lit[-n_partial:])
+            mask = np.packbits(np.ones(n_partial, dtype=bool))
+            for i, (bits_byte, mask_byte) in enumerate(zip(bits, mask)):
+                self.buffer[n_bytes + i] = (
+                    self.buffer[n_bytes + i] & ~mask_byte | bits_byte
+                ) & 0xFF
+
+    def frame(self, i: int = 0) -> memoryview:
+        """Return a view of the raw bytes of a frame, without copying."""
+        return memoryview(self.buffer)[
+            i * self.frame_bytes : (i + 1) * self.frame_bytes
+        ]
+
+    def iter_rows(
+        self,
+        frame: int = 0,
+        on: bytes = b"#",
+        off: bytes = b".",
+    ) -> Iterator[bytes]:
+        """Yield each row of a frame as a line of on and off characters."""
+        key = (on, off)
+        if key not in self._row_luts:
+            self._row_luts[key] = [
+                b"".join(on if byte & (0x80 >> i) else off for i in range(8))
+                for byte in range(256)
+            ]
+        lut = self._row_luts[key]
+
+        frame_bytes = self.frame(frame)
+        for start in range(0, self.frame_bytes, self.row_bytes):
+            row = frame_bytes[start : start + self.row_bytes]
+            yield b"".join([lut[byte] for byte in row])[: self.width * len(on)]
+
+
 @dataclass
 class VideoSystem:
     cycle: int = 0
     x: int = 1
     signal_strengths: list[int] = field(default_factory=list)
     pixels: list[str] = field(default_factory=list)
+    framebuffer: Optional[FrameBuffer] = None
 
     def run_cycles(self, commands: list[str]):
         for command in commands:
@@ -25,14 +111,8 @@ class VideoSystem:
         self.check_signal()
 
     def add_cycle(self, val: int):
-        self.write_pixel()
-        self.cycle += 1
-        self.check_signal()
-
-        self.write_pixel()
-        self.cycle += 1
-        self.check_signal()
-
+        self.noop_cycle()
+        self.noop_cycle()
         self.x += val
 
     def get_signal_strength(self):
@@ -42,6 +122,11 @@ class VideoSystem:
         self.signal_strengths.append(self.get_signal_strength())
 
     def write_pixel(self):
+        if self.framebuffer:
+            col = self.cycle % self.framebuffer.width
+            self.framebuffer.set_pixel(self.cycle, -1 <= self.x - col <= 1)
+            return
+
         sprite_pos = (self.x - 1, self.x, self.x + 1)
         if (self.cycle % 40) in sprite_pos:
             self.pixels.append("#")
@@ -49,20 +134,262 @@ class VideoSystem:
             self.pixels.append(".")
 
 
+def compile_deltas(commands: list[str]) -> array:
+    """Compile a program to the change in X at the end of each cycle."""
+    deltas = array("q")
+    for command in commands:
+        if command == "noop":
+            deltas.append(0)
+        elif command[:4] == "addx":
+            # addx takes two cycles and only changes X after the second.
+            deltas.extend((0, int(command[5:])))
+
+    return deltas
+
+
+@dataclass
+class CompiledProgram:
+    """A program compiled to the X register value during every cycle.
+
+    Attributes:
+        x: The X register during each cycle, where index 0 is cycle 1.
+    """
+
+    x: np.ndarray
+
+    @classmethod
+    def from_commands(cls, commands: list[str]) -> "CompiledProgram":
+        """Compile a program, taking a prefix sum of the X register deltas."""
+        deltas = np.frombuffer(compile_deltas(commands), dtype=np.int64)
+        x = np.ones(len(deltas), dtype=np.int64)
+        # X only changes at the end of a cycle, so it lags the deltas by one.
+        x[1:] += np.cumsum(deltas[:-1])
+        return cls(x)
+
+    @property
+    def n_cycles(self) -> int:
+        """The number of cycles the program runs for."""
+        return len(self.x)
+
+    def get_signal_strength(self, cycle: int) -> int:
+        """Return the signal strength during a cycle, counting from 1."""
+        self._check_cycles(np.array([cycle]))
+        return cycle * int(self.x[cycle - 1])
+
+    def get_signal_strengths(self, cycles: Iterable[int]) -> np.ndarray:
+        """Return the signal strengths during the given cycles, counting from 1."""
+        cycles = np.asarray(list(cycles), dtype=np.int64)
+        self._check_cycles(cycles)
+        return cycles * self.x[cycles - 1]
+
+    def _check_cycles(self, cycles: np.ndarray) -> None:
+        """Raise a ValueError if any cycle is outside 1 to n_cycles."""
+        out_of_range = cycles[(cycles < 1) | (cycles > self.n_cycles)]
+        if out_of_range.size:
+            raise ValueError(
+                f"Cycle {out_of_range[0]} is outside the program's "
+                f"{self.n_cycles} cycles."
+            )
+
+    def get_lit(self, width: int = 40) -> np.ndarray:
+        """Return whether the pixel drawn during each cycle is lit."""
+        positions = np.arange(self.n_cycles) % width
+        return np.abs(self.x - positions) <= 1
+
+    def get_pixels(self, width: int = 40) -> np.ndarray:
+        """Return whether each pixel is lit, as a boolean array of full rows."""
+        n_rows = self.n_cycles // width
+        return self.get_lit(width)[: n_rows * width].reshape(n_rows, width)
+
+    def render(self, framebuffer: FrameBuffer) -> FrameBuffer:
+        """Render the pixels of every cycle into a framebuffer in one go."""
+        framebuffer.write_pixels(self.get_lit(framebuffer.width))
+        return framebuffer
+
+
+Registers = dict[str, int]
+# Executes an instruction on the registers, returning a jump relative to the
+# instruction, or None to carry on to the next one.
+Execute = Callable[[Registers, tuple], Optional[int]]
+# A decoded operand: whether it names a register, and the name or immediate value.
+Operand = tuple[bool, int | str]
+# Called with the cycle number and the registers during that cycle.
+Hook = Callable[[int, Registers], None]
+
+
+@dataclass
+class Instruction:
+    """An instruction in an instruction set.
+
+    Attributes:
+        name: The opcode as written in the program.
+        cycles: The number of cycles the instruction takes.
+        execute: Applies the instruction once its cycles have completed.
+    """
+
+    name: str
+    cycles: int
+    execute: Execute
+
+
+def _read(registers: Registers, operand: Operand) -> int:
+    """Return an operand's value, reading unset registers as 0."""
+    is_register, value = operand
+    return registers.get(value, 0) if is_register else value
+
+
+def _register(operand: Operand) -> str:
+    """Return the register an operand names, for instructions that write to it."""
+    is_register, value = operand
+    if not is_register:
+        raise ValueError(f"Cannot write to the immediate value {value}.")
+    return value
+
+
+def _add(registers: Registers, args: tuple) -> None:
+    register = _register(args[0])
+    registers[register] = registers.get(register, 0) + _read(registers, args[1])
+
+
+def _set(registers: Registers, args: tuple) -> None:
+    registers[_register(args[0])] = _read(registers, args[1])
+
+
+def _jnz(registers: Registers, args: tuple) -> Optional[int]:
+    return _read(registers, args[1]) if _read(registers, args[0]) else None
+
+
+X_REGISTER: Operand = (True, "x")
+
+INSTRUCTION_SET: list[Instruction] = [
+    Instruction("noop", 1, lambda registers, args: None),
+    Instruction(
+        "addx", 2, lambda registers, args: _add(registers, (X_REGISTER, *args))
+    ),
+]
+
+# Multi-register arithmetic and relative jumps, for branches and loops.
+EXTENDED_INSTRUCTION_SET: list[Instruction] = [
+    *INSTRUCTION_SET,
+    Instruction("add", 2, _add),
+    Instruction("set", 1, _set),
+    Instruction("jnz", 1, _jnz),
+]
+
+
+class Interpreter:
+    """A CPU interpreter driven by a pre-decoded opcode table.
+
+    The program is decoded once into opcode indices and arguments. Hooks
+    only fire on the cycles they subscribe to, so cycles in between run in
+    a tight loop without any per-cycle calls.
+    """
+
+    def __init__(
+        self,
+        commands: list[str],
+        instruction_set: list[Instruction] = INSTRUCTION_SET,
+        registers: Optional[Registers] = None,
+    ):
+        """Decode the program against the instruction set."""
+        self.instructions = instruction_set
+        self.costs = [instruction.cycles for instruction in instruction_set]
+        self.executes = [instruction.execute for instruction in instruction_set]
+        self.opcodes = {
+            instruction.name: i for i, instruction in enumerate(instruction_set)
+        }
+        self.ops, self.args = self.decode(commands)
+
+        self.registers: Registers = registers if registers is not None else {"x": 1}
+        self.cycle = 0
+        self.pc = 0
+        # Subscribed (cycle, hook index) pairs in order, and the next to fire.
+        self._hook_cycles: list[tuple[int, int]] = []
+        self._hooks: list[Hook] = []
+        self._next_hook = 0
+
+    def decode(self, commands: list[str]) -> tuple[list[int], list[tuple]]:
+        """Decode commands to opcode indices and arguments."""
+        ops, args = [], []
+        for command in commands:
+            name, *operands = command.split()
+            if name not in self.opcodes:
+                raise ValueError(f"Unknown instruction: '{name}'.")
+            ops.append(self.opcodes[name])
+            args.append(tuple(_parse_operand(operand) for operand in operands))
+
+        return ops, args
+
+    def subscribe(self, cycles: Iterable[int], hook: Hook) -> None:
+        """Call the hook during each of the given cycles, counting from 1."""
+        self._hooks.append(hook)
+        hook_id = len(self._hooks) - 1
+        self._hook_cycles = sorted(
+            self._hook_cycles[self._next_hook :]
+            + [(cycle, hook_id) for cycle in cycles if cycle > self.cycle]
+        )
+        self._next_hook = 0
+
+    def run_until(self, cycle: Optional[int] = None) -> int:
+        """Run until the given cycle has completed, or the program ends.
+
+        Instructions are atomic, so the cycle reached may overshoot by up to
+        the cost of the last instruction less one. Returns the cycle reached.
+        """
+        ops, args, costs, executes = self.ops, self.args, self.costs, self.executes
+        registers, hooks, hook_cycles = self.registers, self._hooks, self._hook_cycles
+        pc, now, next_hook = self.pc, self.cycle, self._next_hook
+        limit = math.inf if cycle is None else cycle
+        next_hook_cycle = (
+            hook_cycles[next_hook][0] if next_hook < len(hook_cycles) else math.inf
+        )
+
+        # A jump outside the program, in either direction, halts it.
+        while 0 <= pc < len(ops) and now < limit:
+            op = ops[pc]
+            now += costs[op]
+            # Hooks see the registers during the cycle, before the instruction
+            # completes.
+            while next_hook_cycle <= now:
+                hook_cycle, hook_id = hook_cycles[next_hook]
+                hooks[hook_id](hook_cycle, registers)
+                next_hook += 1
+                next_hook_cycle = (
+                    hook_cycles[next_hook][0]
+                    if next_hook < len(hook_cycles)
+                    else math.inf
+                )
+
+            jump = executes[op](registers, args[pc])
+            pc += 1 if jump is None else jump
+
+        self.pc, self.cycle, self._next_hook = pc, now, next_hook
+        return now
+
+    def run(self) -> int:
+        """Run the program to the end, returning the number of cycles taken."""
+        return self.run_until()
+
+
+def _parse_operand(operand: str) -> Operand:
+    """Parse an operand to an immediate int value, or a register name."""
+    try:
+        return False, int(operand)
+    except ValueError:
+        return True, operand
+
+
 if __name__ == "__main__":
     with open(get_input_path()) as f:
         instructions = [line.rstrip("\n") for line in f]
 
-    video_sys = VideoSystem()
-    video_sys.run_cycles(instructions)
-    observation_cycles = [i - 1 for i in [20, 60, 100, 140, 180, 220]]
+    program = CompiledProgram.from_commands(instructions)
+    observation_cycles = [20, 60, 100, 140, 180, 220]
     # Solution - part 1:
     print("Sum of the signal strengths at the observation cycles is:")
-    print(sum(itemgetter(*observation_cycles)(video_sys.signal_strengths)))
+    print(program.get_signal_strengths(observation_cycles).sum())
 
     print("The hidden letters are:")
-    pixels = video_sys.pixels
-    n = 40
-    for i in range(0, len(pixels) - n + 1, n):
-        batch = pixels[i : i + n]
-        print("".join(batch))
+    framebuffer = program.render(FrameBuffer(width=40, height=6))
+    for row in framebuffer.iter_rows():
+        print(row.decode())
@@ -6,6 +6,8 @@ from copy import deepcopy
 from dataclasses import dataclass, field
 from typing import Callable
 
+import numpy as np
+
 from aoc_helpers.core import get_input_path, split_list
 
 OPERATOR_MAP = {
@@ -92,6 +94,154 @@ class MonkeyGame:
         return monkey1 * monkey2
 
 
+@dataclass
+class VectorisedMonkeyGame(MonkeyGame):
+    """A MonkeyGame that processes each monkey's items as one NumPy batch.
+
+    Items are held in int64 arrays. The operation, worry reduction and
+    divisibility test are applied to a monkey's whole batch at once, and the
+    items are routed to the target monkeys with boolean masks. Without the
+    LCM, worry levels must stay within int64.
+    """
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.item_arrays: list[np.ndarray] = self.create_item_arrays()
+
+    def create_item_arrays(self) -> list[np.ndarray]:
+        return [np.array(m.items, dtype=np.int64) for m in self.monkey_dict.values()]
+
+    def reset(self):
+        super().reset()
+        self.item_arrays = self.create_item_arrays()
+
+    def play_round(self, use_lcm: bool = False):
+        for i, monkey in self.monkey_dict.items():
+            items = self.item_arrays[i]
+            if not len(items):
+                continue
+
+            # Items have all been thrown, including to this monkey itself.
+            self.item_arrays[i] = items[:0]
+            monkey.inspections += len(items)
+            # Operations are built from operator functions, so apply to arrays.
+            items = monkey.operation(items)
+            if use_lcm:
+                items = np.where(items > self.lcm, items % self.lcm, items)
+            else:
+                items //= 3
+
+            is_divisible = items % monkey.divisor == 0
+            for to_monkey, mask in (
+                (monkey.true_monkey, is_divisible),
+                (monkey.false_monkey, ~is_divisible),
+            ):
+                self.item_arrays[to_monkey] = np.concatenate(
+                    (self.item_arrays[to_monkey], items[mask])
+                )
+
+
+@dataclass
+class ItemCycle:
+    """The inspections of a single item, up to the point its path repeats.
+
+    Attributes:
+        cumulative: Inspections by each monkey after each round, where row 0
+            is before any rounds.
+        start: The round the repeating part of the path starts at.
+        length: The number of rounds in the repeating part.
+    """
+
+    cumulative: np.ndarray
+    start: int
+    length: int
+
+    def count_inspections(self, n_rounds: int) -> list[int]:
+        """Return the inspections by each monkey after any number of rounds."""
+        if n_rounds <= self.start + self.length:
+            return self.cumulative[n_rounds].tolist()
+
+        n_cycles, remainder = divmod(n_rounds - self.start, self.length)
+        before = self.cumulative[self.start].tolist()
+        per_cycle = (self.cumulative[self.start + self.length] - before).tolist()
+        partial = (self.cumulative[self.start + remainder] - before).tolist()
+        # Python ints, so huge round counts can't overflow.
+        return [b + n_cycles * c + p for b, c, p in zip(before, per_cycle, partial)]
+
+
+class ItemCycleSolver:
+    """Solves a MonkeyGame under the LCM rule by following each item on its own.
+
+    With worry levels kept modulo the LCM, an item's path only depends on
+    which monkey holds it and its worry level at the start of a round. There
+    are finitely many such states, so each path ends up repeating, and the
+    inspections can be extrapolated to any number of rounds.
+    """
+
+    def __init__(self, game: MonkeyGame):
+        self.monkeys = game.monkeys
+        self.lcm = game.lcm
+        self._cycles: dict[tuple[int, int], ItemCycle] = {}
+
+    def play_item_round(
+        self,
+        monkey_no: int,
+        worry: int,
+        counts: list[int],
+    ) -> tuple[int, int]:
+        """Play one round for an item, returning its state for the next round."""
+        while True:
+            monkey = self.monkeys[monkey_no]
+            counts[monkey_no] += 1
+            worry = monkey.operation(worry) % self.lcm
+            to_monkey = monkey.throw_to(worry)
+            # Monkeys play in order, so an item thrown back to an earlier
+            # monkey (or the same one) waits until the next round.
+            if to_monkey <= monkey_no:
+                return to_monkey, worry
+            monkey_no = to_monkey
+
+    def find_cycle(self, monkey_no: int, worry: int) -> ItemCycle:
+        """Follow an item round by round until its state repeats."""
+        state = (monkey_no, worry % self.lcm)
+        if state in self._cycles:
+            return self._cycles[state]
+
+        first_seen: dict[tuple[int, int], int] = {}
+        counts = [0] * len(self.monkeys)
+        cumulative = [list(counts)]
+        while state not in first_seen:
+            first_seen[state] = len(first_seen)
+            state = self.play_item_round(*state, counts)
+            cumulative.append(list(counts))
+
+        start = first_seen[state]
+        cycle = ItemCycle(
+            np.array(cumulative, dtype=np.int64),
+            start=start,
+            length=len(first_seen) - start,
+        )
+        self._cycles[(monkey_no, worry % self.lcm)] = cycle
+        return cycle
+
+    def count_inspections(self, n_rounds: int) -> list[int]:
+        """Return the inspections by each monkey after any number of rounds."""
+        totals = [0] * len(self.monkeys)
+        for monkey_no, monkey in enumerate(self.monkeys):
+            for item in monkey.items:
+                cycle = self.find_cycle(monkey_no, item)
+                totals = [
+                    t + n for t, n in zip(totals, cycle.count_inspections(n_rounds))
+                ]
+
+        return totals
+
+    def calculate_monkey_business(self, n_rounds: int) -> int:
+        """Return the product of the inspections of the two most active monkeys."""
+        monkey1, monkey2 = sorted(self.count_inspections(n_rounds))[-2:]
+        return monkey1 * monkey2
+
+
 @dataclass
 class StartsWith(str):
     string: str
@@ -148,7 +298,7 @@ if __name__ == "__main__":
     with open(get_input_path()) as f:
         monkey_notes = [line.rstrip("\n") for line in f]
 
-    game = MonkeyGame(*monkey_parser(monkey_notes))
+    game = VectorisedMonkeyGame(monkey_parser(monkey_notes))
     game.play_rounds(20)
     print("The level of monkey business after 20 rounds is:")
     print(game.calculate_monkey_business())
@@ -157,3 +307,7 @@ if __name__ == "__main__":
     game.play_rounds(10000, use_lcm=True)
     print("The level of monkey business after 10000 rounds is:")
     print(game.calculate_monkey_business())
+
+    solver = ItemCycleSolver(game)
+    print("The level of monkey business after 10^12 rounds is:")
+    print(solver.calculate_monkey_business(10**12))